@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from typing import List
+from typing import List, Literal
 
 from app.core import database
 from app.models.user import User
@@ -318,3 +318,120 @@ async def get_dashboard_stats(
         "total_revenue_cents": total_revenue_cents,
         "active_categories": active_categories,
     }
+
+
+# ============================================
+# RATE LIMITS
+# ============================================
+
+@router.get("/rate-limits")
+async def get_rate_limit_stats(
+    admin: User = Depends(require_admin)
+):
+    """Rate limit policies, cluster-wide rejections and this worker's counters"""
+    from app.core.rate_limit import RATE_LIMIT_POLICIES, rate_limiter
+
+    return {
+        "policies": {
+            name: {"limit": p.limit, "period": p.period, "key": p.key, "burst": p.effective_burst}
+            for name, p in RATE_LIMIT_POLICIES.items()
+        },
+        "rejections": await rate_limiter.rejection_counts(),
+        "worker": dict(rate_limiter.stats),
+    }
+
+
+# ============================================
+# PRESENCE
+# ============================================
+
+@router.get("/presence")
+async def get_presence(
+    user_ids: str,
+    admin: User = Depends(require_admin)
+):
+    """Live WebSocket connection counts for a comma-separated list of user ids"""
+    from app.core.presence import presence_service
+
+    try:
+        ids = [int(uid) for uid in user_ids.split(",") if uid.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="user_ids must be comma-separated integers")
+    if len(ids) > 500:
+        raise HTTPException(status_code=400, detail="At most 500 user ids per request")
+
+    return {
+        "connections": await presence_service.online_counts(ids),
+        "worker": dict(presence_service.stats),
+    }
+
+
+# ============================================
+# DB POOL
+# ============================================
+
+@router.get("/db-pool")
+async def get_db_pool_status(
+    admin: User = Depends(require_admin)
+):
+    """Pool status and connections held longer than the leak threshold on this worker"""
+    from app.core.config import settings
+    from app.core.pool_monitor import pool_leak_detector
+
+    return {
+        "pool": pool_leak_detector.pool_status(),
+        "leak_threshold_seconds": settings.DB_POOL_LEAK_SECONDS,
+        "held": pool_leak_detector.held(older_than=settings.DB_POOL_LEAK_SECONDS),
+    }
+
+
+# ============================================
+# WEBSOCKETS
+# ============================================
+
+@router.get("/websockets")
+async def get_websocket_stats(
+    admin: User = Depends(require_admin)
+):
+    """Connections, send queue depth and drops on this worker"""
+    from app.api.endpoints.ws import manager
+
+    return manager.stats()
+
+
+# ============================================
+# PROFILING
+# ============================================
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(10.0, ge=1, le=100),
+    idle: bool = False,
+    fine_gil: bool = False,
+    format: Literal["collapsed", "json"] = "collapsed",
+    admin: User = Depends(require_super_admin)
+):
+    """Sample this worker's threads for `seconds` and return collapsed stacks
+    (flamegraph.pl / speedscope input), or a JSON summary with format=json.
+    fine_gil=true trades worker throughput for less sampling skew (see app/core/profiler.py)"""
+    from fastapi.responses import PlainTextResponse
+    from app.core.profiler import ProfilerBusy, sampling_profiler
+
+    try:
+        result = await sampling_profiler.profile(seconds, interval_ms / 1000, idle=idle, fine_gil=fine_gil)
+    except ProfilerBusy as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+    if format == "json":
+        return {
+            "pid": result["pid"],
+            "seconds": result["seconds"],
+            "interval_ms": interval_ms,
+            "samples": result["samples"],
+            "stacks": dict(result["stacks"].most_common(500)),
+        }
+    return PlainTextResponse(
+        sampling_profiler.collapsed(result["stacks"]),
+        headers={"X-Worker-Pid": str(result["pid"]), "X-Profile-Samples": str(result["samples"])},
+    )
@@ -1,27 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+from fastapi import APIRouter, Depends, HTTPException, status
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from app.api import deps
 from app.core import security, database
+from app.core.rate_limit import rate_limit
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, UserResponse
 from pydantic import BaseModel
 
 router = APIRouter()
 
-# SEC-006: Rate limiter for auth endpoints
-limiter = Limiter(key_func=get_remote_address)
-
 class RefreshTokenRequest(BaseModel):
     refresh_token: str
 
-@router.post("/register")
-@limiter.limit("5/minute")  # SEC-006: Limit registration attempts
-async def register(request: Request, user_in: UserCreate, db: AsyncSession = Depends(database.get_db)):
+@router.post("/register", dependencies=[Depends(rate_limit("auth.register"))])  # SEC-006: Limit registration attempts
+async def register(user_in: UserCreate, db: AsyncSession = Depends(database.get_db)):
     # Check if user exists
     result = await db.execute(select(User).where(User.email == user_in.email))
     if result.scalars().first():
@@ -62,9 +57,8 @@ async def register(request: Request, user_in: UserCreate, db: AsyncSession = Dep
         payment_methods=[]
     )
 
-@router.post("/login")
-@limiter.limit("10/minute")  # SEC-006: Limit login attempts to prevent brute force
-async def login(request: Request, user_in: UserLogin, db: AsyncSession = Depends(database.get_db)):
+@router.post("/login", dependencies=[Depends(rate_limit("auth.login"))])  # SEC-006: Limit login attempts to prevent brute force
+async def login(user_in: UserLogin, db: AsyncSession = Depends(database.get_db)):
     # Authenticate
     result = await db.execute(select(User).where(User.email == user_in.email))
     user = result.scalars().first()
@@ -88,9 +82,8 @@ async def login(request: Request, user_in: UserLogin, db: AsyncSession = Depends
         "user": user
     }
 
-@router.post("/refresh")
-@limiter.limit("20/minute")  # SEC-006: Limit refresh attempts
-async def refresh_token(request: Request, token_request: RefreshTokenRequest, db: AsyncSession = Depends(database.get_db)):
+@router.post("/refresh", dependencies=[Depends(rate_limit("auth.refresh"))])  # SEC-006: Limit refresh attempts
+async def refresh_token(token_request: RefreshTokenRequest, db: AsyncSession = Depends(database.get_db)):
     """
     Exchange a valid refresh token for a new access token.
     """
@@ -8,10 +8,16 @@ from app.api import deps
 from app.models.models import Task, TaskThread, TaskMessage, Review, ReviewStatus
 from app.models.user import User
 from app.schemas import chat as schemas
+from app.core.responses import model_list_response
+from app.core.rate_limit import rate_limit
+from app.core.query_budget import query_budget
+from app.services.badge_service import UNREAD_MESSAGES, badge_service
+from app.services.snapshots import message_snapshot, with_snapshots
+from app.services.read_receipts import mark_read, publish_read_receipts
 
 router = APIRouter()
 
-@router.get("/my-threads", response_model=List[schemas.TaskThreadResponse])
+@router.get("/my-threads", response_model=List[schemas.TaskThreadResponse], dependencies=[Depends(rate_limit("chat.threads")), Depends(query_budget(6))])
 async def get_my_threads(
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
@@ -37,37 +43,36 @@ async def get_my_threads(
     result = await db.execute(query)
     threads = result.scalars().all()
     
-    # Enrich threads with partner details
-    enriched_threads = []
-    for thread in threads:
-        # Determine the "other" user (partner)
-        if current_user.role == 'helper':
-            partner_id = thread.client_id
-        else:
-            partner_id = thread.helper_id
-            
-        # Fetch partner user
-        partner_result = await db.execute(select(User).where(User.id == partner_id))
-        partner = partner_result.scalars().first()
-        
-        # Calculate rating from visible reviews
-        rating_result = await db.execute(
+    # Helper details and ratings for every thread in two queries
+    helper_ids = {thread.helper_id for thread in threads}
+    helpers = {}
+    ratings = {}
+    if helper_ids:
+        helpers_result = await db.execute(select(User).where(User.id.in_(helper_ids)))
+        helpers = {u.id: u for u in helpers_result.scalars().all()}
+        ratings_result = await db.execute(
             select(
+                Review.to_user_id,
                 sql_func.avg(Review.stars).label("avg_rating"),
                 sql_func.count(Review.id).label("review_count")
             ).where(
-                Review.to_user_id == thread.helper_id,
+                Review.to_user_id.in_(helper_ids),
                 Review.status == ReviewStatus.VISIBLE.value
-            )
+            ).group_by(Review.to_user_id)
         )
-        rating_row = rating_result.first()
+        ratings = {row.to_user_id: row for row in ratings_result.all()}
+    
+    # Enrich threads with helper details
+    enriched_threads = []
+    for thread in threads:
+        # Calculate rating from visible reviews
+        rating_row = ratings.get(thread.helper_id)
         avg_rating = float(rating_row.avg_rating) if rating_row and rating_row.avg_rating else None
         review_count = rating_row.review_count if rating_row else 0
         
+        helper = helpers.get(thread.helper_id)
         # Format name as "First L."
         helper_display_name = None
-        helper_result = await db.execute(select(User).where(User.id == thread.helper_id))
-        helper = helper_result.scalars().first()
         if helper and helper.name:
             parts = helper.name.strip().split()
             if len(parts) >= 2:
@@ -104,7 +109,7 @@ async def get_my_threads(
         )
         enriched_threads.append(thread_response)
     
-    return enriched_threads
+    return model_list_response(enriched_threads, schemas.TaskThreadResponse)
 
 @router.post("/tasks/{task_id}/thread", response_model=schemas.TaskThreadResponse)
 async def get_or_create_thread(
@@ -177,7 +182,7 @@ async def get_or_create_thread(
     
     return thread
 
-@router.get("/tasks/{task_id}/threads", response_model=List[schemas.TaskThreadResponse])
+@router.get("/tasks/{task_id}/threads", response_model=List[schemas.TaskThreadResponse], dependencies=[Depends(rate_limit("chat.threads"))])
 async def get_task_threads(
     task_id: int,
     current_user: User = Depends(deps.get_current_user),
@@ -264,9 +269,9 @@ async def get_task_threads(
         )
         enriched_threads.append(thread_response)
     
-    return enriched_threads
+    return model_list_response(enriched_threads, schemas.TaskThreadResponse)
 
-@router.get("/threads/{thread_id}/messages", response_model=List[schemas.TaskMessageResponse])
+@router.get("/threads/{thread_id}/messages", response_model=List[schemas.TaskMessageResponse], dependencies=[Depends(rate_limit("chat.messages")), Depends(query_budget(5))])
 async def get_messages(
     thread_id: int,
     current_user: User = Depends(deps.get_current_user),
@@ -304,7 +309,7 @@ async def get_messages(
             }
     
     # Build response with sender details
-    return [
+    return model_list_response([
         schemas.TaskMessageResponse(
             id=m.id,
             thread_id=m.thread_id,
@@ -320,7 +325,36 @@ async def get_messages(
             sender_review_count=senders.get(m.sender_id, {}).get("review_count"),
         )
         for m in messages
-    ]
+    ], schemas.TaskMessageResponse)
+
+@router.post("/threads/{thread_id}/read", response_model=schemas.ThreadReadResponse)
+async def mark_thread_read(
+    thread_id: int,
+    read_in: schemas.ThreadReadRequest,
+    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_db)
+):
+    """
+    Mark every message from the other party up to `up_to_message_id` as read.
+    One UPDATE however many messages; the sender gets a read_receipt event.
+    """
+    thread_result = await db.execute(select(TaskThread).where(TaskThread.id == thread_id))
+    thread = thread_result.scalars().first()
+    if not thread:
+        raise HTTPException(status_code=404, detail="Thread not found")
+        
+    if current_user.id not in [thread.client_id, thread.helper_id]:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    
+    changed = await mark_read(db, [(thread_id, current_user.id, read_in.up_to_message_id)])
+    await publish_read_receipts(changed)
+    
+    info = changed.get((thread_id, current_user.id))
+    return schemas.ThreadReadResponse(
+        thread_id=thread_id,
+        up_to_message_id=info["up_to_message_id"] if info else read_in.up_to_message_id,
+        marked=info["count"] if info else 0,
+    )
 
 @router.post("/threads/{thread_id}/messages", response_model=schemas.TaskMessageResponse)
 async def send_message(
@@ -330,7 +364,6 @@ async def send_message(
     db: AsyncSession = Depends(deps.get_db)
 ):
     from app.core.redis_client import redis_client
-    import json
     
     # Verify participation
     thread_result = await db.execute(select(TaskThread).where(TaskThread.id == thread_id))
@@ -354,14 +387,18 @@ async def send_message(
     
     # Notify the other party via WebSocket
     recipient_id = thread.helper_id if current_user.id == thread.client_id else thread.client_id
-    await redis_client.publish(
-        f"user:{recipient_id}",
-        json.dumps({
-            "type": "new_message",
-            "thread_id": thread_id,
-            "sender_id": current_user.id,
-            "message_id": message.id,
-        })
+    await badge_service.incr(recipient_id, UNREAD_MESSAGES)
+    await redis_client.publish_event(
+        user_id=recipient_id,
+        event_type="new_message",
+        payload=with_snapshots(
+            {
+                "thread_id": thread_id,
+                "sender_id": current_user.id,
+                "message_id": message.id,
+            },
+            message=message_snapshot(message),
+        )
     )
     
     return message
@@ -6,11 +6,14 @@ from typing import List
 
 from app.api import deps
 from app.core import database
+from app.core.rate_limit import rate_limit
+from app.core.query_budget import query_budget
 from app.models.user import User
 from app.models.user_document import UserDocument
 from app.models.models import Task, TaskAssignment, Review, TaskThread, TaskMessage
 from app.schemas.user import UserResponse, UserUpdate
 from app.schemas.user_document import UserDocumentCreate, UserDocumentResponse
+from app.services.profile_service import profile_service
 
 router = APIRouter()
 
@@ -61,6 +64,7 @@ async def update_helper_profile(
     db.add(current_user)
     await db.commit()
     await db.refresh(current_user)
+    await profile_service.invalidate(current_user.id)
     return UserResponse(
         id=current_user.id,
         email=current_user.email,
@@ -97,7 +101,7 @@ async def request_verification(
     return {"status": "pending", "message": "Verification request submitted"}
 
 
-@router.get("/stats")
+@router.get("/stats", dependencies=[Depends(rate_limit("helper.stats")), Depends(query_budget(5))])
 async def get_helper_stats(
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(database.get_db),
@@ -171,7 +175,7 @@ async def get_helper_stats(
     }
 
 
-@router.get("/my-threads")
+@router.get("/my-threads", dependencies=[Depends(rate_limit("chat.threads")), Depends(query_budget(6))])
 async def get_helper_threads(
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(database.get_db),
@@ -195,41 +199,45 @@ async def get_helper_threads(
     )
     threads = threads_result.scalars().all()
     
+    thread_ids = [thread.id for thread in threads]
+    if not thread_ids:
+        return []
+    
+    # Task, client, last message and unread count for every thread in four queries
+    tasks_result = await db.execute(select(Task).where(Task.id.in_({t.task_id for t in threads})))
+    tasks = {task.id: task for task in tasks_result.scalars().all()}
+    
+    clients_result = await db.execute(select(User).where(User.id.in_({t.client_id for t in threads})))
+    clients = {client.id: client for client in clients_result.scalars().all()}
+    
+    last_ids = (
+        select(sql_func.max(TaskMessage.id))
+        .where(TaskMessage.thread_id.in_(thread_ids))
+        .group_by(TaskMessage.thread_id)
+    )
+    last_msg_result = await db.execute(select(TaskMessage).where(TaskMessage.id.in_(last_ids)))
+    last_messages = {msg.thread_id: msg for msg in last_msg_result.scalars().all()}
+    
+    # Count unread messages (messages from client not read by helper)
+    unread_result = await db.execute(
+        select(TaskMessage.thread_id, sql_func.count(TaskMessage.id))
+        .where(
+            TaskMessage.thread_id.in_(thread_ids),
+            TaskMessage.sender_id != current_user.id,
+            TaskMessage.read_at.is_(None)
+        )
+        .group_by(TaskMessage.thread_id)
+    )
+    unread_counts = dict(unread_result.all())
+    
     result = []
     for thread in threads:
-        # Get task info
-        task_result = await db.execute(
-            select(Task).where(Task.id == thread.task_id)
-        )
-        task = task_result.scalar_one_or_none()
+        task = tasks.get(thread.task_id)
         if not task:
             continue
-            
-        # Get client info
-        client_result = await db.execute(
-            select(User).where(User.id == thread.client_id)
-        )
-        client = client_result.scalar_one_or_none()
-        
-        # Get last message
-        last_msg_result = await db.execute(
-            select(TaskMessage)
-            .where(TaskMessage.thread_id == thread.id)
-            .order_by(TaskMessage.created_at.desc())
-            .limit(1)
-        )
-        last_msg = last_msg_result.scalar_one_or_none()
-        
-        # Count unread messages (messages from client not read by helper)
-        unread_result = await db.execute(
-            select(sql_func.count(TaskMessage.id))
-            .where(
-                TaskMessage.thread_id == thread.id,
-                TaskMessage.sender_id != current_user.id,
-                TaskMessage.read_at.is_(None)
-            )
-        )
-        unread_count = unread_result.scalar() or 0
+        client = clients.get(thread.client_id)
+        last_msg = last_messages.get(thread.id)
+        unread_count = unread_counts.get(thread.id, 0)
         
         result.append({
             "thread_id": thread.id,
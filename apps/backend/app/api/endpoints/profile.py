@@ -2,12 +2,15 @@ from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api import deps
 from app.core import database
+from app.core.query_budget import query_budget
 from app.models.user import User
 from app.models.address import Address
 from app.models.payment_method import PaymentMethod
-from app.schemas.user import UserResponse, UserUpdate
+from app.schemas.user import BadgesResponse, UserResponse, UserUpdate
 from app.schemas.address import AddressCreate, AddressResponse, AddressUpdate
 from app.schemas.payment_method import PaymentMethodCreate, PaymentMethodResponse
+from app.services.profile_service import profile_service
+from app.services.badge_service import badge_service
 from sqlalchemy import select
 import os
 import uuid
@@ -84,6 +87,7 @@ async def update_user_me(
 
     db.add(current_user)
     await db.commit()
+    await profile_service.invalidate(current_user.id)
 
     # Re-fetch to get relationships and updated formatting
     result = await db.execute(
@@ -112,6 +116,14 @@ async def update_user_me(
         payment_methods=[]
     )
 
+@router.get("/me/badges", response_model=BadgesResponse, dependencies=[Depends(query_budget(3))])
+async def read_my_badges(
+    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(database.get_db),
+):
+    """Unread messages and new offers, served from Redis counters."""
+    return BadgesResponse(**await badge_service.get(db, current_user.id))
+
 # ADDRESSES
 @router.post("/addresses", response_model=AddressResponse)
 async def create_address(
@@ -163,6 +175,7 @@ async def become_helper(
     current_user.role = "helper"
     db.add(current_user)
     await db.commit()
+    await profile_service.invalidate(current_user.id)
     
     # Re-fetch with eager loading
     result = await db.execute(
@@ -8,11 +8,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 
 from app.api import deps
+from app.core.query_budget import query_budget
 from app.models.models import Task, Review, ReviewStatus, TaskStatus
 from app.models.user import User
 from app.schemas.reviews import (
     ReviewCreate, ReviewUpdate, ReviewResponse, ReviewStatusResponse
 )
+from app.services.review_service import review_service
 
 router = APIRouter()
 
@@ -31,24 +33,6 @@ def format_user_name(user: User) -> str:
     return parts[0].capitalize() if parts else "User"
 
 
-async def check_and_reveal_reviews(db: AsyncSession, task_id: int):
-    """
-    Check if both reviews are submitted for a task.
-    If so, reveal them (change status from PENDING_BLIND to VISIBLE).
-    """
-    reviews_result = await db.execute(
-        select(Review).where(Review.task_id == task_id)
-    )
-    reviews = reviews_result.scalars().all()
-    
-    if len(reviews) == 2:
-        # Both parties reviewed, reveal both
-        for review in reviews:
-            if review.status == ReviewStatus.PENDING_BLIND.value:
-                review.status = ReviewStatus.VISIBLE.value
-        await db.commit()
-
-
 @router.get("/tasks/{task_id}/reviews/status", response_model=ReviewStatusResponse)
 async def get_review_status(
     task_id: int,
@@ -231,8 +215,9 @@ async def submit_review(
     await db.commit()
     await db.refresh(review)
     
-    # Check if we should reveal reviews (both submitted)
-    await check_and_reveal_reviews(db, task_id)
+    # Reveal both reviews if the other party has already reviewed
+    # (one-sided reviews are revealed later by the timeout job)
+    await review_service.reveal_task_reviews(db, task_id)
     await db.refresh(review)
     
     return ReviewResponse(
@@ -309,7 +294,7 @@ async def update_my_review(
     )
 
 
-@router.get("/tasks/{task_id}/reviews")
+@router.get("/tasks/{task_id}/reviews", dependencies=[Depends(query_budget(3))])
 async def get_task_reviews(
     task_id: int,
     current_user: User = Depends(deps.get_current_user),
@@ -322,25 +307,34 @@ async def get_task_reviews(
     result = await db.execute(
         select(Review).where(Review.task_id == task_id)
     )
-    reviews = result.scalars().all()
+    reviews = [
+        r for r in result.scalars().all()
+        # Show if visible OR if it's my own review
+        if r.status == ReviewStatus.VISIBLE.value or r.from_user_id == current_user.id
+    ]
+    
+    # Load all authors in one query
+    authors = {}
+    author_ids = {r.from_user_id for r in reviews}
+    if author_ids:
+        authors_result = await db.execute(select(User).where(User.id.in_(author_ids)))
+        authors = {u.id: u for u in authors_result.scalars().all()}
     
     visible_reviews = []
     for r in reviews:
-        # Show if visible OR if it's my own review
-        if r.status == ReviewStatus.VISIBLE.value or r.from_user_id == current_user.id:
-            from_user = await db.get(User, r.from_user_id)
-            visible_reviews.append(ReviewResponse(
-                id=r.id,
-                task_id=r.task_id,
-                from_user_id=r.from_user_id,
-                to_user_id=r.to_user_id,
-                from_user_name=format_user_name(from_user),
-                from_role=r.from_role,
-                stars=r.stars,
-                comment=r.comment,
-                tags=r.tags or [],
-                status=r.status,
-                created_at=r.created_at,
-            ))
+        from_user = authors.get(r.from_user_id)
+        visible_reviews.append(ReviewResponse(
+            id=r.id,
+            task_id=r.task_id,
+            from_user_id=r.from_user_id,
+            to_user_id=r.to_user_id,
+            from_user_name=format_user_name(from_user),
+            from_role=r.from_role,
+            stars=r.stars,
+            comment=r.comment,
+            tags=r.tags or [],
+            status=r.status,
+            created_at=r.created_at,
+        ))
     
     return visible_reviews
@@ -6,6 +6,7 @@ Stripe Connect Integration
 """
 import stripe
 from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from pydantic import BaseModel
@@ -13,6 +14,7 @@ from typing import Optional
 
 from app.core import database
 from app.core.config import settings
+from app.core.task_lock import task_lock_manager, check_fence
 from app.models.user import User
 from app.models.models import Task, Payment, TaskStatus, PaymentStatus
 from app.models.category_settings import CategorySettings
@@ -198,22 +200,36 @@ async def create_payment_intent(
         # Default 15% fee
         fee_cents = int(amount_cents * 0.15)
     
-    # Create payment intent with transfer
-    try:
-        payment_intent = stripe.PaymentIntent.create(
-            amount=amount_cents,
-            currency="eur",
-            payment_method_types=["card"],
-            application_fee_amount=fee_cents,
-            transfer_data={
-                "destination": helper.stripe_account_id,
-            },
-            metadata={
-                "task_id": str(task.id),
-                "client_id": str(current_user.id),
-                "helper_id": str(helper.id),
-            },
-        )
+    # One payment intent per task at a time: concurrent requests would
+    # create duplicate intents and race on the Payment row
+    async with task_lock_manager.hold(task.id, owner=f"user:{current_user.id}") as lock:
+        # The Stripe client is blocking: run it off the event loop so the
+        # lease keeps being renewed, and hold no row lock meanwhile. The
+        # idempotency key makes a holder that took over after a lost lease
+        # get the same intent back instead of creating a second one.
+        try:
+            payment_intent = await run_in_threadpool(
+                stripe.PaymentIntent.create,
+                amount=amount_cents,
+                currency="eur",
+                payment_method_types=["card"],
+                application_fee_amount=fee_cents,
+                transfer_data={
+                    "destination": helper.stripe_account_id,
+                },
+                metadata={
+                    "task_id": str(task.id),
+                    "client_id": str(current_user.id),
+                    "helper_id": str(helper.id),
+                },
+                idempotency_key=f"payment-intent:task:{task.id}:{amount_cents}:{fee_cents}:{helper.stripe_account_id}",
+            )
+        except stripe.error.StripeError as e:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Fence, write, commit: a newer holder rejects this write
+        await check_fence(db, task.id, lock.token)
         
         # Create/update payment record
         payment_result = await db.execute(
@@ -243,9 +259,6 @@ async def create_payment_intent(
             amount_cents=amount_cents,
             fee_cents=fee_cents,
         )
-        
-    except stripe.error.StripeError as e:
-        raise HTTPException(status_code=400, detail=str(e))
 
 
 # ============================================
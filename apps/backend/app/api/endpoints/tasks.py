@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Header, Query, Response
+import base64
 import shutil
 import os
 import uuid
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, exists, update, case, literal, String, tuple_
 from sqlalchemy.orm import selectinload
-from geoalchemy2.shape import to_shape
-from typing import List
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import List, Optional, Union
 
 from app.api import deps
 from app.api import deps
@@ -15,6 +16,12 @@ from app.models.user import User
 from app.schemas import tasks as schemas
 from app.schemas.task_offers import TaskOfferCreate, TaskOfferResponse
 from app.schemas.chat import TaskMessageCreate, TaskMessageResponse, TaskThreadResponse
+from app.core.responses import model_list_response
+from app.core.rate_limit import rate_limit
+from app.core.query_budget import query_budget
+from app.core.etag import compute_etag, etag_matches, not_modified
+from app.services.badge_service import NEW_OFFERS, UNREAD_MESSAGES, badge_service
+from app.services.snapshots import can_view_exact_address, message_snapshot, offer_snapshot, with_snapshots
 
 router = APIRouter()
 
@@ -83,14 +90,143 @@ async def create_task(
     
     return _to_task_out(new_task)
 
-@router.get("/nearby", response_model=List[schemas.TaskOut])
+def _task_version_probe(viewer_id: int):
+    """Build the cheap version probe behind task ETags.
+
+    One row per task with only scalar watermarks: version and status, the
+    latest offer change, the newest proof and whether the viewer is the
+    assigned helper. Nothing is hydrated, so a matching If-None-Match
+    costs a single indexed query.
+    """
+    from app.models.models import TaskAssignment
+
+    offers_changed_at = (
+        select(func.max(func.coalesce(TaskOffer.updated_at, TaskOffer.created_at)))
+        .where(TaskOffer.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    offer_count = (
+        select(func.count(TaskOffer.id))
+        .where(TaskOffer.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    last_proof_id = (
+        select(func.max(TaskProof.id))
+        .where(TaskProof.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    viewer_is_assignee = exists().where(
+        TaskAssignment.task_id == Task.id,
+        TaskAssignment.helper_id == viewer_id
+    )
+    return select(
+        Task.id,
+        Task.client_id,
+        Task.status,
+        Task.version,
+        offers_changed_at.label("offers_changed_at"),
+        offer_count.label("offer_count"),
+        last_proof_id.label("last_proof_id"),
+        viewer_is_assignee.label("viewer_is_assignee"),
+    )
+
+async def _task_list_etag(db: AsyncSession, task_ids, *parts) -> str:
+    """Weak ETag for a task list from one aggregate row.
+
+    `task_ids` is a SELECT of Task.id for the list's filter. Membership,
+    version and status go into a summed hash, offers into their count and
+    latest change, proofs into the newest id, so the cost is one scan of the
+    list's tasks and no per-row subqueries. `parts` must include every query
+    parameter that changes the response.
+    """
+    offers_changed_at = (
+        select(func.max(func.coalesce(TaskOffer.updated_at, TaskOffer.created_at)))
+        .where(TaskOffer.task_id.in_(task_ids))
+        .scalar_subquery()
+    )
+    offer_count = select(func.count(TaskOffer.id)).where(TaskOffer.task_id.in_(task_ids)).scalar_subquery()
+    last_proof_id = select(func.max(TaskProof.id)).where(TaskProof.task_id.in_(task_ids)).scalar_subquery()
+    result = await db.execute(
+        select(
+            func.count(Task.id),
+            func.sum(func.hashtext(func.concat_ws(":", Task.id, Task.version, Task.status))),
+            offers_changed_at,
+            offer_count,
+            last_proof_id,
+        ).where(Task.id.in_(task_ids))
+    )
+    return compute_etag(*result.one(), *parts)
+
+def _task_card_query(show_exact_address: bool, origin_wkt: str = None):
+    """Build the SELECT for the "card" list view.
+
+    Only the card columns are selected and no relation is loaded; the offer
+    count comes from a correlated COUNT and, when an origin is given, the
+    distance is computed by PostGIS against the same point the card shows.
+    """
+    if show_exact_address:
+        card_lat, card_lon = Task.lat, Task.lon
+        card_point = Task.location
+    else:
+        card_lat = func.coalesce(Task.public_lat, Task.lat)
+        card_lon = func.coalesce(Task.public_lon, Task.lon)
+        card_point = func.coalesce(Task.public_location, Task.location)
+
+    offer_count = (
+        select(func.count(TaskOffer.id))
+        .where(TaskOffer.task_id == Task.id)
+        .correlate(Task)
+        .scalar_subquery()
+    )
+    columns = [
+        Task.id, Task.title, Task.category, Task.price_cents, Task.urgency,
+        Task.status, Task.city, Task.scheduled_at, Task.created_at,
+        card_lat.label("lat"), card_lon.label("lon"),
+        offer_count.label("offer_count"),
+    ]
+    if origin_wkt:
+        distance_m = func.ST_DistanceSphere(card_point, func.ST_GeomFromText(origin_wkt, 4326))
+        columns.append((distance_m / 1000.0).label("distance_km"))
+    return select(*columns)
+
+async def _offers_by_task(db: AsyncSession, task_ids: List[int]) -> dict:
+    """Offers (with helper and helper reviews) for many tasks in three queries."""
+    offers = {task_id: [] for task_id in task_ids}
+    if not task_ids:
+        return offers
+    result = await db.execute(
+        select(TaskOffer).where(TaskOffer.task_id.in_(task_ids))
+        .options(selectinload(TaskOffer.helper).selectinload(User.reviews_received))
+    )
+    for offer in result.scalars().all():
+        offers[offer.task_id].append(offer)
+    return offers
+
+async def _task_cards(db: AsyncSession, stmt) -> List[schemas.TaskCard]:
+    result = await db.execute(stmt)
+    return [schemas.TaskCard(**row._mapping) for row in result.all()]
+
+@router.get("/nearby", response_model=Union[List[schemas.TaskOut], List[schemas.TaskCard]], dependencies=[Depends(rate_limit("tasks.nearby")), Depends(query_budget(9))])
 async def get_nearby_tasks(
     lat: float,
     lon: float,
     radius_km: float = 50.0,
+    view: schemas.TaskListView = "full",
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
 ):
+    # Conditional GET: one aggregate before loading anything
+    etag = await _task_list_etag(
+        db, select(Task.id).where(Task.status == TaskStatus.POSTED),
+        "nearby", view, "public", lat, lon, radius_km,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
     # PostGIS query
     # ST_DWithin takes meters if using geography, or degrees if geometry.
     # We are using geometry(POINT, 4326). 
@@ -98,11 +234,17 @@ async def get_nearby_tasks(
     # Note: ST_DistanceSphere is good for lat/lon.
     location = f'POINT({lon} {lat})'
     
+    if view == "card":
+        # Nearby cards: blurred location, no address, no relations
+        stmt = _task_card_query(show_exact_address=False, origin_wkt=location).where(
+            Task.status == TaskStatus.POSTED
+        ).order_by(Task.created_at.desc())
+        return model_list_response(await _task_cards(db, stmt), schemas.TaskCard, headers={"ETag": etag})
+    
     stmt = select(Task).where(
         Task.status == TaskStatus.POSTED
     ).options(
         selectinload(Task.proofs), 
-        selectinload(Task.offers),
         selectinload(Task.client).selectinload(User.reviews_received)
     )
     
@@ -117,19 +259,91 @@ async def get_nearby_tasks(
     tasks = result.scalars().all()
     
     # Manual hydration for offers (same pattern as /tasks/created)
-    final_list = []
-    for t in tasks:
-        offer_stmt = select(TaskOffer).where(TaskOffer.task_id == t.id).options(selectinload(TaskOffer.helper).selectinload(User.reviews_received))
-        offer_res = await db.execute(offer_stmt)
-        offers_list = offer_res.scalars().all()
-        # Nearby tasks: always use blurred location, no exact address
-        final_list.append(_to_task_out(t, explicit_offers=offers_list, show_exact_address=False))
+    offers = await _offers_by_task(db, [t.id for t in tasks])
+    # Nearby tasks: always use blurred location, no exact address
+    final_list = [_to_task_out(t, explicit_offers=offers[t.id], show_exact_address=False) for t in tasks]
         
-    return final_list
+    return model_list_response(final_list, schemas.TaskOut, headers={"ETag": etag})
+
+def _encode_search_cursor(rank: float, task_id: int) -> str:
+    raw = f"{rank!r}|{task_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def _decode_search_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        rank, task_id = raw.rsplit("|", 1)
+        return float(rank), int(task_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/search", response_model=schemas.TaskSearchPage, dependencies=[Depends(rate_limit("tasks.search")), Depends(query_budget(3))])
+async def search_tasks(
+    q: str = Query(..., min_length=2, max_length=200),
+    category: Optional[str] = None,
+    min_price_cents: Optional[int] = None,
+    max_price_cents: Optional[int] = None,
+    status: TaskStatus = TaskStatus.POSTED,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    radius_km: float = 50.0,
+    cursor: Optional[str] = None,
+    size: int = 20,
+    current_user: User = Depends(deps.get_current_user),
+    db: AsyncSession = Depends(deps.get_db)
+):
+    """Full-text search over task titles and descriptions.
 
-@router.get("/created", response_model=List[schemas.TaskOut])
+    `q` uses web search syntax ("quoted phrases", -exclusions, OR) with
+    Italian stemming and is matched against the GIN-indexed search_vector.
+    Results are task cards with blurred locations, ordered by relevance
+    (title matches first) and paged by an opaque cursor.
+    """
+    if (lat is None) != (lon is None):
+        raise HTTPException(status_code=400, detail="lat and lon must be given together")
+    size = max(1, min(size, 50))
+
+    ts_query = func.websearch_to_tsquery('italian', q)
+    rank = func.ts_rank_cd(Task.search_vector, ts_query)
+    origin = f'POINT({lon} {lat})' if lat is not None else None
+
+    stmt = _task_card_query(show_exact_address=False, origin_wkt=origin).add_columns(
+        rank.label("rank")
+    ).where(
+        Task.search_vector.bool_op("@@")(ts_query),
+        Task.status == status,
+    )
+    if category:
+        stmt = stmt.where(Task.category == category)
+    if min_price_cents is not None:
+        stmt = stmt.where(Task.price_cents >= min_price_cents)
+    if max_price_cents is not None:
+        stmt = stmt.where(Task.price_cents <= max_price_cents)
+    if origin:
+        # Same blurred point the cards show, so results match their distance_km
+        stmt = stmt.where(
+            func.ST_DistanceSphere(
+                func.coalesce(Task.public_location, Task.location),
+                func.ST_GeomFromText(origin, 4326),
+            ) <= radius_km * 1000
+        )
+    if cursor:
+        cursor_rank, cursor_id = _decode_search_cursor(cursor)
+        stmt = stmt.where(tuple_(rank, Task.id) < tuple_(cursor_rank, cursor_id))
+    stmt = stmt.order_by(rank.desc(), Task.id.desc()).limit(size + 1)
+
+    cards = await _task_cards(db, stmt)
+    next_cursor = None
+    if len(cards) > size:
+        cards = cards[:size]
+        next_cursor = _encode_search_cursor(cards[-1].rank, cards[-1].id)
+    return schemas.TaskSearchPage(items=cards, next_cursor=next_cursor)
+
+@router.get("/created", response_model=Union[List[schemas.TaskOut], List[schemas.TaskCard]], dependencies=[Depends(rate_limit("tasks.list")), Depends(query_budget(7))])
 async def get_created_tasks(
     client_id: int,
+    view: schemas.TaskListView = "full",
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
 ):
@@ -139,24 +353,32 @@ async def get_created_tasks(
         # Helpers might need to see CLIENT's history? 
         # For now, restrict created to owner
         raise HTTPException(status_code=403, detail="Not authorized")
+    etag = await _task_list_etag(
+        db, select(Task.id).where(Task.client_id == client_id), "created", client_id, view, "exact"
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    if view == "card":
+        stmt = _task_card_query(show_exact_address=True).where(
+            Task.client_id == client_id
+        ).order_by(Task.created_at.desc())
+        return model_list_response(await _task_cards(db, stmt), schemas.TaskCard, headers={"ETag": etag})
     stmt = select(Task).where(Task.client_id == client_id).order_by(Task.created_at.desc()).options(
         selectinload(Task.proofs)
     )
     result = await db.execute(stmt)
     tasks = result.scalars().all()
     # Manual hydration hack to ensure offers are visible
-    final_list = []
-    for t in tasks:
-        offer_stmt = select(TaskOffer).where(TaskOffer.task_id == t.id).options(selectinload(TaskOffer.helper).selectinload(User.reviews_received))
-        offer_res = await db.execute(offer_stmt)
-        offers_list = offer_res.scalars().all()
-        final_list.append(_to_task_out(t, explicit_offers=offers_list))
-        
-    return final_list
+    offers = await _offers_by_task(db, [t.id for t in tasks])
+    final_list = [_to_task_out(t, explicit_offers=offers[t.id]) for t in tasks]
+
+    return model_list_response(final_list, schemas.TaskOut, headers={"ETag": etag})
 
-@router.get("/assigned", response_model=List[schemas.TaskOut])
+@router.get("/assigned", response_model=Union[List[schemas.TaskOut], List[schemas.TaskCard]], dependencies=[Depends(rate_limit("tasks.list")), Depends(query_budget(4))])
 async def get_assigned_tasks(
     helper_id: int,
+    view: schemas.TaskListView = "full",
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
 ):
@@ -168,20 +390,54 @@ async def get_assigned_tasks(
     # Simpler: Join TaskAssignment
     from app.models.models import TaskAssignment
     
+    etag = await _task_list_etag(
+        db, select(TaskAssignment.task_id).where(TaskAssignment.helper_id == helper_id),
+        "assigned", helper_id, view, "exact",
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    
+    if view == "card":
+        stmt = _task_card_query(show_exact_address=True).join(
+            TaskAssignment, Task.id == TaskAssignment.task_id
+        ).where(TaskAssignment.helper_id == helper_id)
+        return model_list_response(await _task_cards(db, stmt), schemas.TaskCard, headers={"ETag": etag})
+    
     stmt = select(Task).join(TaskAssignment, Task.id == TaskAssignment.task_id).where(
         TaskAssignment.helper_id == helper_id
     ).options(selectinload(Task.proofs))
     
     result = await db.execute(stmt)
-    return [_to_task_out(t) for t in result.scalars().all()]
+    return model_list_response([_to_task_out(t) for t in result.scalars().all()], schemas.TaskOut, headers={"ETag": etag})
 
-@router.get("/{task_id}", response_model=schemas.TaskOut)
+@router.get("/{task_id}", response_model=schemas.TaskOut, dependencies=[Depends(rate_limit("tasks.detail")), Depends(query_budget(8))])
 async def get_task(
     task_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
 ):
-    from app.models.models import TaskAssignment
+    # Cheap single-row version probe (no offers/proofs hydration)
+    probe_result = await db.execute(_task_version_probe(current_user.id).where(Task.id == task_id))
+    probe = probe_result.first()
+    if not probe:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    # Determine visibility: exact address shown to owner or assigned helper (status >= ASSIGNED)
+    show_exact = can_view_exact_address(
+        current_user.id,
+        probe.client_id,
+        probe.status,
+        current_user.role == 'helper' and bool(probe.viewer_is_assignee),
+    )
+
+    etag = compute_etag(
+        probe.id, probe.version, probe.status, probe.offers_changed_at,
+        probe.offer_count, probe.last_proof_id, "exact" if show_exact else "public"
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
     
     stmt = select(Task).where(Task.id == task_id).options(
         selectinload(Task.proofs)
@@ -196,24 +452,7 @@ async def get_task(
     offer_res = await db.execute(offer_stmt)
     offers_list = offer_res.scalars().all()
     
-    # Determine visibility: exact address shown to owner or assigned helper (status >= ASSIGNED)
-    is_owner = current_user.id == task.client_id
-    
-    # Check if user is the assigned helper
-    is_assigned_helper = False
-    if current_user.role == 'helper' and task.status in ['assigned', 'in_progress', 'in_confirmation', 'completed']:
-        # Check assignment
-        assign_result = await db.execute(
-            select(TaskAssignment).where(
-                TaskAssignment.task_id == task.id,
-                TaskAssignment.helper_id == current_user.id
-            )
-        )
-        assignment = assign_result.scalars().first()
-        is_assigned_helper = assignment is not None
-    
-    show_exact = is_owner or is_assigned_helper
-    
+    response.headers["ETag"] = etag
     return _to_task_out(task, explicit_offers=offers_list, show_exact_address=show_exact)
 
 def _to_task_out(task: Task, explicit_offers: List[TaskOffer] = None, show_exact_address: bool = True) -> schemas.TaskOut:
@@ -224,18 +463,15 @@ def _to_task_out(task: Task, explicit_offers: List[TaskOffer] = None, show_exact
         explicit_offers: Pre-loaded offers (for manual hydration)
         show_exact_address: If True, show exact location and address. If False, use public_location.
     """
-    # Determine which location to use
+    # Determine which location to use (coordinates come pre-extracted from SQL)
     if show_exact_address:
-        sh = to_shape(task.location)
-        lat, lon = sh.y, sh.x
+        lat, lon = task.lat, task.lon
     else:
         # Use blurred public_location if available
-        if task.public_location:
-            sh = to_shape(task.public_location)
-            lat, lon = sh.y, sh.x
+        if task.public_lat is not None:
+            lat, lon = task.public_lat, task.public_lon
         else:
-            sh = to_shape(task.location)
-            lat, lon = sh.y, sh.x
+            lat, lon = task.lat, task.lon
 
     # Client Profile Construction
     client_profile = None
@@ -314,10 +550,75 @@ def _to_task_out(task: Task, explicit_offers: List[TaskOffer] = None, show_exact
         completion_requested_at=task.completion_requested_at,
         completed_at=task.completed_at,
         dispute_open_until=task.dispute_open_until,
-        proofs=[schemas.TaskProofResponse.from_orm(p) for p in task.proofs] if 'proofs' in task.__dict__ else [],
+        proofs=[schemas.TaskProofResponse.model_validate(p) for p in task.proofs] if 'proofs' in task.__dict__ else [],
         offers=offer_responses
     )
 
+async def _cas_update_task(
+    db: AsyncSession,
+    task_id: int,
+    owner_id: int,
+    expected_version: Optional[int],
+    values: dict,
+    not_posted_detail: str,
+) -> Task:
+    """Apply an owner edit as one compare-and-swap UPDATE ... RETURNING.
+
+    The row is only written if it belongs to the owner, is still POSTED and
+    (when the client sent one) still has the expected version; the version
+    is bumped in the same statement. If nothing matched, a follow-up probe
+    tells 404/403/400 apart from a lost race (409).
+    """
+    conditions = [
+        Task.id == task_id,
+        Task.client_id == owner_id,
+        Task.status == TaskStatus.POSTED,
+    ]
+    if expected_version is not None:
+        conditions.append(Task.version == expected_version)
+
+    stmt = (
+        update(Task)
+        .where(*conditions)
+        .values(**values, version=Task.version + 1)
+        .returning(
+            Task,
+            # column_property coordinates are not part of RETURNING Task
+            func.ST_Y(Task.location).label("lat"),
+            func.ST_X(Task.location).label("lon"),
+            func.ST_Y(Task.public_location).label("public_lat"),
+            func.ST_X(Task.public_location).label("public_lon"),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(stmt)
+    row = result.first()
+
+    if row is None:
+        await db.rollback()
+        current_result = await db.execute(
+            select(Task.client_id, Task.status, Task.version).where(Task.id == task_id)
+        )
+        current = current_result.first()
+        if not current:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if current.client_id != owner_id:
+            raise HTTPException(status_code=403, detail="Not authorized")
+        if current.status != TaskStatus.POSTED:
+            raise HTTPException(status_code=400, detail=not_posted_detail)
+        raise HTTPException(
+            status_code=409,
+            detail=f"Task was modified concurrently (current version: {current.version})"
+        )
+
+    await db.commit()
+    task = row[0]
+    for key in ("lat", "lon", "public_lat", "public_lon"):
+        set_committed_value(task, key, getattr(row, key))
+    # Proofs are not loaded: edits are only allowed while POSTED, and proofs
+    # are uploaded after assignment, so TaskOut.proofs is empty anyway.
+    return task
+
 @router.patch("/{task_id}", response_model=schemas.TaskOut)
 async def update_task(
     task_id: int,
@@ -325,48 +626,38 @@ async def update_task(
     current_user: User = Depends(deps.get_current_user),
     db: AsyncSession = Depends(deps.get_db)
 ):
-    # Verify ownership
-    result = await db.execute(select(Task).where(Task.id == task_id).options(selectinload(Task.proofs)))
-    task = result.scalars().first()
-    
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-        
-    if task.client_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-        
-    # Guard: Editing allowed only if POSTED
-    if task.status != TaskStatus.POSTED:
-        raise HTTPException(status_code=400, detail="Cannot edit task that is not in POSTED state")
-        
     # Update Fields
+    values = {}
     if task_in.title is not None:
-        task.title = task_in.title
+        values["title"] = task_in.title
     if task_in.description is not None:
-        task.description = task_in.description
+        values["description"] = task_in.description
     if task_in.category is not None:
-        task.category = task_in.category
+        values["category"] = task_in.category
     if task_in.price_cents is not None:
-        task.price_cents = task_in.price_cents
+        values["price_cents"] = task_in.price_cents
     if task_in.urgency is not None:
-        task.urgency = task_in.urgency
+        values["urgency"] = task_in.urgency
     
-    # Update location if changed
+    # Update location if changed (and re-blur public_location in the same statement)
     if task_in.lat is not None and task_in.lon is not None:
-         task.location = f'POINT({task_in.lon} {task_in.lat})'
+        point = func.ST_GeomFromText(f'POINT({task_in.lon} {task_in.lat})', 4326)
+        values["location"] = point
+        values["public_location"] = func.ST_Transform(
+            func.ST_SnapToGrid(func.ST_Transform(point, 3857), 500),
+            4326
+        )
          
     if task_in.address_line is not None:
-        task.address_line = task_in.address_line
+        values["address_line"] = task_in.address_line
     if task_in.city is not None:
-        task.city = task_in.city
-    
-    # Increment Revision
-    task.version += 1
-    
-    db.add(task)
-    await db.commit()
-    await db.refresh(task)
+        values["city"] = task_in.city
     
+    # Verify ownership, POSTED state and version in one round trip
+    task = await _cas_update_task(
+        db, task_id, current_user.id, task_in.version, values,
+        not_posted_detail="Cannot edit task that is not in POSTED state"
+    )
     return _to_task_out(task)
 
 # --- ADDRESS UPDATE ---
@@ -379,6 +670,7 @@ class AddressUpdate(schemas.BaseModel):
     province: str | None = None
     address_extra: str | None = None
     access_notes: str | None = None
+    version: int | None = None  # For optimistic locking check
 
 @router.patch("/{task_id}/address", response_model=schemas.TaskOut)
 async def update_task_address(
@@ -388,54 +680,40 @@ async def update_task_address(
     db: AsyncSession = Depends(deps.get_db)
 ):
     """Update task address. Only allowed when task is in POSTED status."""
-    result = await db.execute(select(Task).where(Task.id == task_id).options(selectinload(Task.proofs)))
-    task = result.scalars().first()
+    # New value where provided, otherwise the row's current value
+    address_fields = ["street", "street_number", "city", "postal_code", "province", "address_extra", "access_notes"]
+    values = {}
+    merged = {}
+    for field in address_fields:
+        new_value = getattr(address_in, field)
+        if new_value is not None:
+            values[field] = new_value
+            merged[field] = literal(new_value, String)
+        else:
+            merged[field] = getattr(Task, field)
     
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-        
-    if task.client_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized")
-        
-    # Only allow address update when POSTED
-    if task.status != TaskStatus.POSTED:
-        raise HTTPException(status_code=400, detail="Address can only be modified when task is in POSTED state")
-    
-    # Update address fields
-    if address_in.street is not None:
-        task.street = address_in.street
-    if address_in.street_number is not None:
-        task.street_number = address_in.street_number
-    if address_in.city is not None:
-        task.city = address_in.city
-    if address_in.postal_code is not None:
-        task.postal_code = address_in.postal_code
-    if address_in.province is not None:
-        task.province = address_in.province
-    if address_in.address_extra is not None:
-        task.address_extra = address_in.address_extra
-    if address_in.access_notes is not None:
-        task.access_notes = address_in.access_notes
-    
-    # Generate formatted address
-    parts = []
-    if task.street:
-        parts.append(f"{task.street}{' ' + task.street_number if task.street_number else ''}")
-    if task.city:
-        parts.append(task.city)
-    if task.postal_code:
-        parts.append(task.postal_code)
-    if task.province:
-        parts.append(task.province)
-    task.formatted_address = ', '.join(parts) if parts else None
-    
-    # Increment version
-    task.version += 1
-    
-    db.add(task)
-    await db.commit()
-    await db.refresh(task)
+    # Generate formatted address in SQL from the merged fields:
+    # "street number, city, postal_code, province", skipping empty parts
+    street_part = case(
+        (func.nullif(merged["street"], "").isnot(None),
+         func.concat_ws(" ", merged["street"], func.nullif(merged["street_number"], ""))),
+        else_=None
+    )
+    values["formatted_address"] = func.nullif(
+        func.concat_ws(
+            ", ",
+            street_part,
+            func.nullif(merged["city"], ""),
+            func.nullif(merged["postal_code"], ""),
+            func.nullif(merged["province"], ""),
+        ),
+        ""
+    )
     
+    task = await _cas_update_task(
+        db, task_id, current_user.id, address_in.version, values,
+        not_posted_detail="Address can only be modified when task is in POSTED state"
+    )
     return _to_task_out(task)
 
 # --- OFFERS ---
@@ -463,6 +741,8 @@ async def create_offer(
     existing_offer = result.scalars().first()
     
     is_update = existing_offer is not None
+    # A new offer, or an update re-submitting a withdrawn/declined one, is new for the client
+    newly_submitted = not is_update or existing_offer.status != OfferStatus.SUBMITTED
     
     if existing_offer:
         existing_offer.price_cents = offer_in.price_cents
@@ -519,13 +799,19 @@ async def create_offer(
     )
     db.add(offer_message)
     await db.commit()
+    await badge_service.incr(task.client_id, UNREAD_MESSAGES)
+    if newly_submitted:
+        await badge_service.incr(task.client_id, NEW_OFFERS)
     
     # Publish WebSocket event to notify client
     from app.core.redis_client import redis_client
     await redis_client.publish_event(
         user_id=task.client_id,
         event_type="new_offer",
-        payload={"task_id": task_id, "offer_id": offer.id, "helper_id": helper_id}
+        payload=with_snapshots(
+            {"task_id": task_id, "offer_id": offer.id, "helper_id": helper_id},
+            offer=offer_snapshot(offer, helper_name=current_user.name),
+        )
     )
     
     return offer
@@ -554,11 +840,16 @@ async def select_offer(
         raise HTTPException(status_code=403, detail="Not authorized to accept offers for this task")
 
     from app.services.task_service import task_service
-    try:
-        task = await task_service.select_offer(db, task_id, offer_id)
-        return _to_task_out(task)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
+    from app.core.task_lock import task_lock_manager
+    # Serialize assignment per task across workers; the fence token guards the DB write
+    async with task_lock_manager.hold(task_id, owner=f"user:{current_user.id}") as lock:
+        try:
+            task = await task_service.select_offer(db, task_id, offer_id, fence_token=lock.token)
+            return _to_task_out(task)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
 @router.post("/{task_id}/offers/{offer_id}/reject")
 async def reject_offer(
@@ -583,9 +874,12 @@ async def reject_offer(
         raise HTTPException(status_code=404, detail="Offer not found")
     
     # Update offer status
+    was_submitted = offer.status == OfferStatus.SUBMITTED
     offer.status = OfferStatus.DECLINED
     db.add(offer)
     await db.commit()
+    if was_submitted:
+        await badge_service.incr(task.client_id, NEW_OFFERS, -1)
     
     # Post rejection message to chat
     thread_result = await db.execute(select(TaskThread).where(
@@ -604,6 +898,7 @@ async def reject_offer(
         )
         db.add(rejection_message)
         await db.commit()
+        await badge_service.incr(offer.helper_id, UNREAD_MESSAGES)
     
     # Publish WebSocket events
     from app.core.redis_client import redis_client
@@ -612,14 +907,20 @@ async def reject_offer(
     await redis_client.publish_event(
         user_id=current_user.id,
         event_type="offer_status_changed",
-        payload={"task_id": task_id, "offer_id": offer.id, "status": "rejected"}
+        payload=with_snapshots(
+            {"task_id": task_id, "offer_id": offer.id, "status": "rejected"},
+            offer=offer_snapshot(offer),
+        )
     )
     
     # Notify Helper
     await redis_client.publish_event(
         user_id=offer.helper_id,
         event_type="offer_rejected",
-        payload={"task_id": task_id, "offer_id": offer.id}
+        payload=with_snapshots(
+            {"task_id": task_id, "offer_id": offer.id},
+            offer=offer_snapshot(offer),
+        )
     )
 
     return {"status": "rejected"}
@@ -668,15 +969,19 @@ async def send_message(
     from app.core.redis_client import redis_client
     # Determine recipient: if sender is client, notify helper; if sender is helper, notify client
     recipient_id = helper_id if sender_id == thread.client_id else thread.client_id
+    await badge_service.incr(recipient_id, UNREAD_MESSAGES)
     await redis_client.publish_event(
         user_id=recipient_id,
         event_type="new_message",
-        payload={"thread_id": thread.id, "task_id": task_id, "sender_id": sender_id}
+        payload=with_snapshots(
+            {"thread_id": thread.id, "task_id": task_id, "sender_id": sender_id, "message_id": new_msg.id},
+            message=message_snapshot(new_msg),
+        )
     )
     
     return new_msg
 
-@router.get("/{task_id}/threads/{helper_id}/messages", response_model=List[TaskMessageResponse])
+@router.get("/{task_id}/threads/{helper_id}/messages", response_model=List[TaskMessageResponse], dependencies=[Depends(rate_limit("chat.messages")), Depends(query_budget(2))])
 async def list_messages(
     task_id: int,
     helper_id: int,
@@ -692,7 +997,10 @@ async def list_messages(
         return []
         
     msgs_res = await db.execute(select(TaskMessage).where(TaskMessage.thread_id == thread.id).order_by(TaskMessage.created_at.asc()))
-    return msgs_res.scalars().all()
+    return model_list_response(
+        [TaskMessageResponse.model_validate(m) for m in msgs_res.scalars().all()],
+        TaskMessageResponse
+    )
 
 # --- PROOFS ---
 
@@ -785,5 +1093,8 @@ async def confirm_completion(
 ):
     client_id = current_user.id
     from app.services.task_service import task_service
-    task = await task_service.confirm_completion(db, task_id, client_id)
+    from app.core.task_lock import task_lock_manager
+    # Payment capture: one confirmation per task at a time
+    async with task_lock_manager.hold(task_id, owner=f"user:{client_id}") as lock:
+        task = await task_service.confirm_completion(db, task_id, client_id, fence_token=lock.token)
     return _to_task_out(task)
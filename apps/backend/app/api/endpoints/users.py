@@ -1,15 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, desc, or_
+from sqlalchemy import select, func, desc, or_, tuple_
 from app.api import deps
 from app.core import database
+from app.core.rate_limit import rate_limit
 from app.models.user import User
 from app.models.models import Task, TaskAssignment, Review, TaskStatus, UserRole, ReviewStatus
-from app.schemas.public_user import PublicUserResponse, PublicUserStats
+from app.schemas.public_user import PublicUserResponse
+from app.services.profile_service import profile_service
 from app.schemas.user import UserResponse # Re-use for reviews if needed, or simple dict
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
+import base64
 
 router = APIRouter()
 
@@ -28,86 +31,50 @@ class PaginatedReviews(BaseModel):
     total: int
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
-@router.get("/{user_id}/public", response_model=PublicUserResponse)
+@router.get("/{user_id}/public", response_model=PublicUserResponse, dependencies=[Depends(rate_limit("users.public"))])
 async def read_public_profile(
     user_id: int,
     db: AsyncSession = Depends(database.get_db),
-    current_user: Optional[User] = Depends(deps.get_current_user_optional) # Optional auth for viewing
 ):
-    # Fetch User
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalars().first()
-    if not user:
+    # Served from the cached read model; a miss is one SELECT on users
+    document = await profile_service.get_public_profile_json(db, user_id)
+    if document is None:
         raise HTTPException(status_code=404, detail="User not found")
+    return Response(content=document, media_type="application/json")
 
-    # Calculate Stats
-    # 1. Rating & Reviews Count
-    reviews_stats = await db.execute(
-        select(
-            func.count(Review.id),
-            func.avg(Review.stars)
-        ).filter(
-            Review.to_user_id == user_id,
-            Review.status == ReviewStatus.VISIBLE.value
-        )
-    )
-    r_count, r_avg = reviews_stats.one()
-    r_count = r_count or 0
-    r_avg = float(r_avg) if r_avg else 0.0
-
-    # 2. Tasks/Jobs Completed
-    completed_count = 0
-    if user.role == UserRole.HELPER:
-        # Helper: jobs completed
-        jobs_stats = await db.execute(
-            select(func.count(TaskAssignment.id))
-            .join(Task, Task.id == TaskAssignment.task_id)
-            .filter(
-                TaskAssignment.helper_id == user_id,
-                Task.status == TaskStatus.COMPLETED
-            )
-        )
-        completed_count = jobs_stats.scalar() or 0
-    else:
-        # Client: tasks posted and completed
-        tasks_stats = await db.execute(
-            select(func.count(Task.id))
-            .filter(
-                Task.client_id == user_id,
-                Task.status == TaskStatus.COMPLETED
-            )
-        )
-        completed_count = tasks_stats.scalar() or 0
-        
-    stats = PublicUserStats(
-        tasks_completed=completed_count,
-        reviews_count=r_count,
-        average_rating=round(r_avg, 1),
-        cancel_rate_label="Reliable" # Placeholder logic
-    )
+def _encode_review_cursor(created_at: datetime, review_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{review_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
 
-    return PublicUserResponse(
-        id=user.id,
-        name=user.name,
-        role=user.role,
-        bio=user.bio,
-        languages=user.languages if user.languages else [],
-        hourly_rate=user.hourly_rate if user.role == UserRole.HELPER else None,
-        skills=user.skills if user.skills else [],
-        stats=stats
-    )
+def _decode_review_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, review_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(review_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@router.get("/{user_id}/reviews", response_model=PaginatedReviews)
+@router.get("/{user_id}/reviews", response_model=PaginatedReviews, dependencies=[Depends(rate_limit("users.public"))])
 async def read_public_reviews(
     user_id: int,
+    cursor: Optional[str] = None,
     page: int = 1,
     size: int = 10,
     db: AsyncSession = Depends(database.get_db)
 ):
-    offset = (page - 1) * size
+    """
+    Visible reviews received by a user, newest first.
+
+    Paged by keyset on (created_at, id): pass back `next_cursor` to get the
+    next page. `page` is still accepted for older clients, but deep pages
+    are only cheap with the cursor.
+    """
+    size = max(1, min(size, 50))
     
-    # Query Reviews
+    # Query Reviews (authors joined in the same query)
+    # Served by ix_reviews_to_user_status_created
     query = (
         select(Review, User.name)
         .join(User, User.id == Review.from_user_id)
@@ -115,22 +82,23 @@ async def read_public_reviews(
             Review.to_user_id == user_id,
             Review.status == ReviewStatus.VISIBLE.value
         )
-        .order_by(desc(Review.created_at))
-        .offset(offset)
-        .limit(size)
+        .order_by(desc(Review.created_at), desc(Review.id))
+        .limit(size + 1)
     )
+    if cursor:
+        cursor_created_at, cursor_id = _decode_review_cursor(cursor)
+        query = query.filter(tuple_(Review.created_at, Review.id) < tuple_(cursor_created_at, cursor_id))
+    elif page > 1:
+        query = query.offset((page - 1) * size)
     
     result = await db.execute(query)
     rows = result.all() # list of (Review, name)
+    has_more = len(rows) > size
+    rows = rows[:size]
     
-    # Total count
-    count_res = await db.execute(
-        select(func.count(Review.id)).filter(
-            Review.to_user_id == user_id,
-            Review.status == ReviewStatus.VISIBLE.value
-        )
-    )
-    total = count_res.scalar() or 0
+    # Total from the maintained counter (see profile_service), not a COUNT(*)
+    total_res = await db.execute(select(User.rating_count).where(User.id == user_id))
+    total = total_res.scalar() or 0
     
     items = []
     for review, from_name in rows:
@@ -141,10 +109,16 @@ async def read_public_reviews(
             comment=review.comment,
             created_at=review.created_at
         ))
+    
+    next_cursor = None
+    if has_more and rows:
+        last_review = rows[-1][0]
+        next_cursor = _encode_review_cursor(last_review.created_at, last_review.id)
         
     return PaginatedReviews(
         items=items,
         total=total,
         page=page,
-        size=size
+        size=size,
+        next_cursor=next_cursor
     )
@@ -1,27 +1,39 @@
 """
 WebSocket endpoint for real-time notifications.
-Uses Redis pub/sub for broadcasting events between connections.
+Events are read from per-user Redis streams (app/core/event_stream.py), so a
+reconnecting client can resume from the last event it saw.
 """
-import json
 import asyncio
-from typing import Dict, Set
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, Query
-from sqlalchemy.ext.asyncio import AsyncSession
+import json
+import logging
+import uuid
+from typing import Dict, List, Optional, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from sqlalchemy import select
 from jose import jwt, JWTError
 from app.core.config import settings
-from app.core.redis_client import redis_client
-from app.api import deps
+from app.core.database import AsyncSessionLocal
+from app.core.event_coalescer import EventCoalescer
+from app.core.event_stream import StreamDispatcher, event_stream
+from app.core.metrics import ws_connections_opened, ws_events
+from app.core.presence import presence_service
+from app.core.ws_sender import SocketSender, send_stats
+from app.services.read_receipts import read_receipt_buffer
 from app.models.user import User
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # Active connections: user_id -> set of WebSocket connections
 active_connections: Dict[int, Set[WebSocket]] = {}
 
 
-async def get_user_id_from_token(token: str, db: AsyncSession) -> int | None:
-    """Extract user_id from JWT token (which contains email)."""
+async def get_user_id_from_token(token: str) -> int | None:
+    """Extract user_id from JWT token (which contains email).
+
+    Uses its own short-lived session: a socket can stay open for hours and
+    must not keep a pooled connection checked out for all that time.
+    """
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         
@@ -34,113 +46,243 @@ async def get_user_id_from_token(token: str, db: AsyncSession) -> int | None:
         if not email:
             return None
             
-        # Lookup user by email
-        result = await db.execute(select(User).where(User.email == email))
-        user = result.scalars().first()
-        return user.id if user else None
+        # Lookup user by email; the connection goes back to the pool here
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(User.id).where(User.email == email))
+            return result.scalar()
     except (JWTError, ValueError, Exception) as e:
-        print(f"WS Auth Error: {e}")
+        logger.warning("WS auth error: %s", e)
         return None
 
 
 class ConnectionManager:
-    """Manages WebSocket connections per user."""
+    """Manages WebSocket connections per user.
+
+    Each user with at least one socket on this worker has a cursor in the
+    worker's StreamDispatcher and one EventCoalescer, shared by all of that
+    user's devices. Every socket is also registered in the cross-worker
+    presence set, and writes through its own bounded SocketSender queue.
+    """
+    
+    def __init__(self):
+        self.coalescers: Dict[int, EventCoalescer] = {}
+        self.senders: Dict[WebSocket, SocketSender] = {}
+        self.dispatcher = StreamDispatcher(self.deliver)
+        # Sockets still being sent their replay; live frames wait here
+        self.replaying: Dict[WebSocket, List[dict]] = {}
     
-    async def connect(self, websocket: WebSocket, user_id: int):
+    async def connect(self, websocket: WebSocket, user_id: int, last_event_id: Optional[str] = None) -> str:
+        """Accept the socket, replay what it missed and return its presence connection id."""
         await websocket.accept()
+        ws_connections_opened.inc()
+        sender = SocketSender(websocket)
+        self.senders[websocket] = sender
+        if last_event_id and not await event_stream.is_resumable(user_id, last_event_id):
+            sender.offer({"type": "resync_required"})
+            last_event_id = None
+        tail_id = await event_stream.tail_id(user_id)
+        
+        # No awaits from here until the socket is registered, so no event
+        # can slip between the replay range and live delivery
         if user_id not in active_connections:
             active_connections[user_id] = set()
         active_connections[user_id].add(websocket)
+        replay_up_to = None
+        if user_id not in self.coalescers:
+            self.coalescers[user_id] = EventCoalescer(
+                lambda message, user_id=user_id: self.send_to_user(user_id, message),
+                delivered_id=last_event_id or tail_id,
+            )
+            # The dispatcher reads everything after the cursor, so the replay
+            # and the switch to live delivery are the same read
+            self.dispatcher.watch(user_id, last_event_id or tail_id)
+        elif last_event_id:
+            # Other devices are already live: replay what they have been sent
+            # to this socket only, holding back live frames meanwhile. Events
+            # still held by the coalescer reach this socket live.
+            replay_up_to = self.coalescers[user_id].delivered_id
+            self.replaying[websocket] = []
+        
+        if replay_up_to:
+            await self._replay(sender, user_id, last_event_id, replay_up_to)
+        
+        connection_id = uuid.uuid4().hex
+        await presence_service.heartbeat(user_id, connection_id)
+        return connection_id
     
-    def disconnect(self, websocket: WebSocket, user_id: int):
+    async def _replay(self, sender: SocketSender, user_id: int, after_id: str, up_to_id: str):
+        websocket = sender.websocket
+        try:
+            for event in await event_stream.replay(user_id, after_id, up_to_id):
+                await sender.put(event)
+            # Then whatever went live in the meantime, until caught up
+            while self.replaying.get(websocket):
+                buffered = self.replaying[websocket]
+                self.replaying[websocket] = []
+                for message in buffered:
+                    await sender.put(message)
+        finally:
+            self.replaying.pop(websocket, None)
+    
+    async def disconnect(self, websocket: WebSocket, user_id: int, connection_id: Optional[str]):
+        if connection_id:
+            await presence_service.leave(user_id, connection_id)
+        self.replaying.pop(websocket, None)
+        sender = self.senders.pop(websocket, None)
+        if sender:
+            await sender.stop()
         if user_id in active_connections:
             active_connections[user_id].discard(websocket)
             if not active_connections[user_id]:
                 del active_connections[user_id]
+        if user_id not in active_connections:
+            self.dispatcher.unwatch(user_id)
+            coalescer = self.coalescers.pop(user_id, None)
+            if coalescer:
+                await coalescer.close()
+    
+    async def deliver(self, user_id: int, message: dict):
+        """Route an event through the user's coalescing stage."""
+        coalescer = self.coalescers.get(user_id)
+        if coalescer:
+            await coalescer.push(message)
     
     async def send_to_user(self, user_id: int, message: dict):
-        """Send message to all connections of a user."""
+        """Send message to all connections of a user.
+
+        Only enqueues: every socket's writer task sends independently, so
+        devices are served concurrently and never wait on each other.
+        """
+        ws_events.inc(message.get("type", "unknown"))
         if user_id in active_connections:
             disconnected = []
-            for ws in active_connections[user_id]:
-                try:
-                    await ws.send_json(message)
-                except Exception:
+            for ws in list(active_connections[user_id]):
+                if ws in self.replaying:
+                    self.replaying[ws].append(message)
+                    continue
+                sender = self.senders.get(ws)
+                if not sender or not sender.offer(message):
                     disconnected.append(ws)
-            # Clean up disconnected
+            # Clean up disconnected (and slow) sockets
             for ws in disconnected:
                 active_connections[user_id].discard(ws)
+    
+    def stats(self) -> dict:
+        depths = [sender.depth for sender in self.senders.values()]
+        return {
+            "users": len(active_connections),
+            "connections": len(self.senders),
+            "queued_frames": sum(depths),
+            "deepest_queue": max(depths, default=0),
+            **send_stats,
+        }
+
+    def collect_metrics(self):
+        """Scrape-time samples for app.core.metrics."""
+        stats = self.stats()
+        outcomes = ("sent", "dropped", "send_timeouts", "send_errors", "slow_consumer_disconnects")
+        return [
+            ("websocket_users", "gauge", "Users with an open WebSocket on this worker", [({}, stats["users"])]),
+            ("websocket_connections", "gauge", "Open WebSockets on this worker", [({}, stats["connections"])]),
+            ("websocket_queued_frames", "gauge", "Frames waiting in WebSocket send queues",
+             [({}, stats["queued_frames"])]),
+            ("websocket_frames_total", "counter", "WebSocket frame send outcomes",
+             [({"outcome": outcome}, stats[outcome]) for outcome in outcomes]),
+        ]
 
 
 manager = ConnectionManager()
 
 
-async def redis_listener(user_id: int, websocket: WebSocket):
-    """Listen to Redis pub/sub channel for this user and forward messages."""
-    pubsub = redis_client.redis.pubsub()
-    channel = f"user:{user_id}"
-    
+def _handle_client_message(user_id: int, data: str):
+    """JSON frames from the client. Currently only read receipts:
+    {"type": "read", "thread_id": 1, "message_id": 42}"""
     try:
-        await pubsub.subscribe(channel)
-        
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
-            if message and message["type"] == "message":
-                try:
-                    data = json.loads(message["data"])
-                    await websocket.send_json(data)
-                except (json.JSONDecodeError, Exception):
-                    pass
-            await asyncio.sleep(0.1)
-    except asyncio.CancelledError:
-        pass
+        message = json.loads(data)
+    except json.JSONDecodeError:
+        return
+    if not isinstance(message, dict) or message.get("type") != "read":
+        return
+    thread_id, message_id = message.get("thread_id"), message.get("message_id")
+    if isinstance(thread_id, int) and isinstance(message_id, int):
+        # Written in batches; participation is checked by the batched UPDATE
+        read_receipt_buffer.mark(user_id, thread_id, message_id)
+
+
+async def _receive_unless_closed(websocket: WebSocket, sender: SocketSender) -> Optional[str]:
+    """Next text frame from the client, or None once the client disconnects
+    or the sender gave up on the socket (slow consumer)."""
+    receive = asyncio.ensure_future(websocket.receive_text())
+    closed = asyncio.ensure_future(sender.closed.wait())
+    try:
+        await asyncio.wait({receive, closed}, return_when=asyncio.FIRST_COMPLETED)
     finally:
-        await pubsub.unsubscribe(channel)
-        await pubsub.close()
+        closed.cancel()
+    if not receive.done():
+        receive.cancel()
+        try:
+            await receive
+        except (asyncio.CancelledError, WebSocketDisconnect):
+            pass
+        return None
+    try:
+        return receive.result()
+    except (WebSocketDisconnect, RuntimeError):
+        return None
 
 
 @router.websocket("/ws")
 async def websocket_endpoint(
     websocket: WebSocket,
     token: str = Query(...),
-    db: AsyncSession = Depends(deps.get_db)
+    last_event_id: Optional[str] = Query(None),
 ):
     """
     WebSocket endpoint for real-time updates.
     
-    Connect with: ws://host/ws?token=<jwt_token>
+    Connect with: ws://host/ws?token=<jwt_token>[&last_event_id=<id>]
+    
+    Every frame carries an "event_id". Reconnect with the last one seen to
+    get the missed events replayed first; {"type": "resync_required"} means
+    they are no longer available and the client should refresh.
     
     Events received:
     - {"type": "new_offer", "task_id": 123, "offer_id": 456}
     - {"type": "task_status_changed", "task_id": 123, "status": "assigned"}
     - {"type": "new_message", "thread_id": 123, "sender_id": 456}
+    - {"type": "read_receipt", "thread_id": 123, "reader_id": 456, "up_to_message_id": 789}
+    
+    Client frames: "ping", and {"type": "read", "thread_id": .., "message_id": ..}
+    to mark a thread read up to a message.
+    
+    Bursts for the same task are merged into one frame: the latest event
+    plus "coalesced": true and a "changes" list (see app/core/event_coalescer.py).
+    Resume from the frame's top-level "event_id", not the ids inside "changes".
     """
     # Authenticate
-    user_id = await get_user_id_from_token(token, db)
+    user_id = await get_user_id_from_token(token)
     if not user_id:
-        print("WS Auth Failed: Invalid token or user not found")
+        logger.info("WS auth failed: invalid token or user not found")
         await websocket.close(code=4001, reason="Invalid token")
         return
     
-    await manager.connect(websocket, user_id)
-    
-    # Start Redis listener task
-    listener_task = asyncio.create_task(redis_listener(user_id, websocket))
-    
+    # Registers the socket (and the user's stream cursor, if it is their
+    # first socket on this worker) after replaying anything missed
+    connection_id = None
     try:
+        connection_id = await manager.connect(websocket, user_id, last_event_id)
+        sender = manager.senders[websocket]
+        
         # Keep connection alive, handle incoming messages (ping/pong)
         while True:
-            try:
-                data = await websocket.receive_text()
-                # Handle ping
-                if data == "ping":
-                    await websocket.send_text("pong")
-            except WebSocketDisconnect:
+            data = await _receive_unless_closed(websocket, sender)
+            if data is None:
                 break
+            # Handle ping (also refreshes presence)
+            if data == "ping":
+                sender.offer("pong")
+                await presence_service.heartbeat(user_id, connection_id)
+            elif data.startswith("{"):
+                _handle_client_message(user_id, data)
     finally:
-        listener_task.cancel()
-        try:
-            await listener_task
-        except asyncio.CancelledError:
-            pass
-        manager.disconnect(websocket, user_id)
+        await manager.disconnect(websocket, user_id, connection_id)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,6 +9,51 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080 # 7 days
 
+    # Rate limiting (Redis-backed, shared by all workers; policies in app/core/rate_limit.py)
+    RATE_LIMIT_ENABLED: bool = True
+
+    # Public profile read model cache
+    PUBLIC_PROFILE_CACHE_TTL_SECONDS: int = 120
+
+    # Blind reviews: one-sided reviews are revealed after this long
+    REVIEW_REVEAL_TIMEOUT_HOURS: int = 14 * 24
+    REVIEW_REVEAL_INTERVAL_SECONDS: int = 600
+    REVIEW_REVEAL_BATCH_SIZE: int = 500
+
+    # WebSocket presence (app/core/presence.py); clients ping every 30s
+    PRESENCE_TTL_SECONDS: int = 75
+
+    # Per-user event streams for resumable WebSocket delivery (app/core/event_stream.py)
+    EVENT_STREAM_MAXLEN: int = 500
+    EVENT_STREAM_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Flag pooled DB connections held longer than this (app/core/pool_monitor.py)
+    DB_POOL_LEAK_SECONDS: int = 30
+    DB_POOL_LEAK_CAPTURE_STACK: bool = False
+
+    # Per-socket WebSocket send queue (app/core/ws_sender.py)
+    WS_SEND_QUEUE_SIZE: int = 100
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+
+    # Embed viewer-safe entity snapshots in real-time events (app/services/snapshots.py)
+    WS_EVENT_SNAPSHOTS: bool = True
+
+    # Write-behind flush interval for WebSocket read receipts (app/services/read_receipts.py)
+    READ_RECEIPT_FLUSH_SECONDS: float = 2.0
+
+    # Redis badge counters (app/services/badge_service.py)
+    BADGE_TTL_SECONDS: int = 7 * 24 * 3600
+    BADGE_RECONCILE_INTERVAL_SECONDS: int = 900
+
+    # Request metrics middleware and GET /metrics (app/core/metrics.py)
+    METRICS_ENABLED: bool = True
+    # Comma-separated addresses/CIDRs allowed to scrape /metrics (peer address, see app/core/rate_limit.py)
+    METRICS_ALLOWED_NETWORKS: str = "127.0.0.1/32,::1/128"
+
+    # Per-request query budgets and N+1 detection (app/core/query_budget.py); "log" or "raise" in dev/tests
+    QUERY_BUDGET_MODE: Literal["off", "log", "raise"] = "off"
+    QUERY_REPEAT_LIMIT: int = 5
+
     
     # Stripe Configuration
     STRIPE_SECRET_KEY: str = "sk_test_PLACEHOLDER"  # Set in .env
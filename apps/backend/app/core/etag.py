@@ -0,0 +1,39 @@
+"""
+ETag helpers for conditional GETs.
+
+ETags are weak (W/"..."): they are derived from cheap version probes
+(task version, status, offer/proof watermarks, viewer visibility) rather
+than from the rendered bytes, so two responses with the same tag are
+semantically equivalent, not byte-identical.
+"""
+import hashlib
+from typing import Optional
+
+from fastapi.responses import Response
+
+
+def compute_etag(*parts) -> str:
+    """Build a weak ETag from the given version parts."""
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    """304 response carrying the current ETag."""
+    return Response(status_code=304, headers={"ETag": etag})
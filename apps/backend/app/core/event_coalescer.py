@@ -0,0 +1,204 @@
+"""
+Per-user coalescing of real-time events before WebSocket delivery.
+
+Busy tasks emit bursts (several new_offer / offer_status_changed events in
+a second) and clients refetch the task once per event. Events for the same
+task or thread are held for a short, per-type window and delivered as one
+frame. The frame is the latest event with `coalesced: true` and a
+`changes` list of every merged event, so clients that only look at `type`
+still refetch once.
+
+Windows are trailing (each new event pushes the flush back) but capped at
+MAX_DELAY_SECONDS after the first event of the group. A type with window 0
+is never delayed: chat messages go out immediately.
+
+Delivery stays in stream order across groups: flushing a group first
+flushes every pending group holding an older event, and an immediate event
+first flushes everything pending. So every delivered event is older than
+every held one, and `delivered_id` (the newest stream id handed to `send`)
+is where a replay for another device must stop.
+
+A frame's top-level `event_id` is the client's resume cursor: every event
+up to it has been sent. A merged frame can contain events on both sides of
+another frame of the same flush, so the cursor it carries may be lower
+than its own latest event (a resume then repeats a little, but never skips).
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.core.event_stream import parse_event_id
+
+# Seconds an event may wait for companions; shorter means higher priority
+COALESCE_WINDOWS: Dict[str, float] = {
+    "new_message": 0.0,
+    "task_status_changed": 0.25,
+    "offer_accepted": 0.25,
+    "offer_rejected": 0.5,
+    "offer_status_changed": 0.5,
+    "new_offer": 0.5,
+    "read_receipt": 1.0,
+}
+DEFAULT_WINDOW_SECONDS = 0.5
+MAX_DELAY_SECONDS = 1.5
+
+GroupKey = Tuple[str, int]
+
+
+def _group_key(event: dict) -> Optional[GroupKey]:
+    if event.get("task_id") is not None:
+        return ("task", event["task_id"])
+    if event.get("thread_id") is not None:
+        return ("thread", event["thread_id"])
+    return None
+
+
+def _change_key(event: dict) -> tuple:
+    # Later events about the same entity supersede earlier ones
+    return (
+        event.get("type"),
+        event.get("offer_id"),
+        event.get("message_id"),
+        event.get("proof_id"),
+    )
+
+
+def _stream_position(event: dict) -> Tuple[int, int]:
+    # Events without a stream id (never expected from the dispatcher) sort first
+    return parse_event_id(event.get("event_id")) or (0, 0)
+
+
+class _Group:
+    def __init__(self, first_at: float):
+        self.first_at = first_at
+        self.deadline = first_at
+        self.changes: Dict[tuple, dict] = {}
+        self.latest: Optional[dict] = None
+        self.oldest: Optional[Tuple[int, int]] = None
+        self.newest: Optional[Tuple[int, int]] = None
+        self.wake = asyncio.Event()
+        self.flusher: Optional[asyncio.Task] = None
+
+    def add(self, event: dict):
+        key = _change_key(event)
+        self.changes.pop(key, None)
+        self.changes[key] = event
+        self.latest = event
+        # The dispatcher delivers in stream order
+        position = _stream_position(event)
+        if self.oldest is None:
+            self.oldest = position
+        self.newest = position
+
+    def frame(self) -> dict:
+        changes: List[dict] = list(self.changes.values())
+        if len(changes) == 1:
+            return changes[0]
+        return {**self.latest, "coalesced": True, "changes": changes}
+
+
+class EventCoalescer:
+    """Buffers one user's events and hands merged frames to `send`."""
+
+    def __init__(self, send: Callable[[dict], Awaitable[None]], delivered_id: Optional[str] = None):
+        self._send = send
+        self._pending: Dict[GroupKey, _Group] = {}
+        # Newest stream id handed to `send`; starts at the dispatcher's cursor
+        self.delivered_id = delivered_id
+        self.stats = {"received": 0, "sent": 0, "merged": 0}
+
+    async def push(self, event: dict):
+        self.stats["received"] += 1
+        window = COALESCE_WINDOWS.get(event.get("type"), DEFAULT_WINDOW_SECONDS)
+        key = _group_key(event)
+        if window <= 0 or key is None:
+            # Held groups are older: they go first so the order stays intact
+            await self._flush(list(self._pending.values()))
+            self.stats["sent"] += 1
+            self._advance(event.get("event_id"))
+            await self._send(event)
+            return
+
+        now = asyncio.get_running_loop().time()
+        group = self._pending.get(key)
+        if group is None:
+            group = _Group(now)
+            self._pending[key] = group
+            group.flusher = asyncio.create_task(self._flush_when_due(key, group))
+        else:
+            self.stats["merged"] += 1
+        group.add(event)
+        # A higher-priority event may pull the flush earlier
+        group.deadline = min(now + window, group.first_at + MAX_DELAY_SECONDS)
+        group.wake.set()
+
+    async def _flush_when_due(self, key: GroupKey, group: _Group):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = group.deadline - loop.time()
+            if delay <= 0:
+                break
+            group.wake.clear()
+            try:
+                await asyncio.wait_for(group.wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        # Older events held in other groups must not be overtaken; flushing
+        # them can extend the range, hence the loop
+        batch = [group]
+        newest = group.newest
+        while True:
+            older = [g for g in self._pending.values() if g not in batch and g.oldest < newest]
+            if not older:
+                break
+            batch += older
+            newest = max(g.newest for g in batch)
+        await self._flush(batch)
+
+    async def _flush(self, groups: List[_Group]):
+        """Send the frames of `groups` in the stream order of their first events."""
+        current = asyncio.current_task()
+        # Unregister before the first await, so no group is sent twice
+        for group in groups:
+            for key, pending in list(self._pending.items()):
+                if pending is group:
+                    del self._pending[key]
+            if group.flusher and group.flusher is not current:
+                group.flusher.cancel()
+        ordered = sorted(groups, key=lambda g: g.oldest)
+        cursor = self.delivered_id
+        for i, group in enumerate(ordered):
+            frame = group.frame()
+            # Not past the first event of a frame still to come in this flush
+            below = ordered[i + 1].oldest if i + 1 < len(ordered) else None
+            for change in frame.get("changes", [frame]):
+                cursor = self._later(cursor, change.get("event_id"), below)
+            if cursor:
+                frame = {**frame, "event_id": cursor}
+            self.stats["sent"] += 1
+            await self._send(frame)
+        for group in ordered:
+            self._advance(group.latest.get("event_id"))
+
+    @staticmethod
+    def _later(current: Optional[str], event_id: Optional[str], below: Optional[Tuple[int, int]] = None) -> Optional[str]:
+        position = parse_event_id(event_id)
+        if not position or (below is not None and position >= below):
+            return current
+        if current is None or position > parse_event_id(current):
+            return event_id
+        return current
+
+    def _advance(self, event_id: Optional[str]):
+        self.delivered_id = self._later(self.delivered_id, event_id)
+
+    async def close(self):
+        """Flush pending groups (the user's last socket on this worker is
+        closing) and stop their timers."""
+        groups = list(self._pending.values())
+        await self._flush(groups)
+        for group in groups:
+            if group.flusher:
+                try:
+                    await group.flusher
+                except asyncio.CancelledError:
+                    pass
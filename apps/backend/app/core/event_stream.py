@@ -0,0 +1,154 @@
+"""
+Per-user event streams for lossless real-time delivery.
+
+Every event for a user is appended to the Redis stream `events:{user_id}`
+(XADD with approximate MAXLEN, so each stream stays bounded) whether or not
+the user is connected. Delivered frames carry the stream entry id as
+`event_id`; a client that reconnects with `?last_event_id=<id>` gets every
+event after it replayed before live delivery resumes, instead of having to
+refresh every screen.
+
+If the requested id has already been trimmed away the client is sent
+{"type": "resync_required"} and should fall back to a full refresh.
+
+Each worker runs one StreamDispatcher that XREADs the streams of all users
+connected to it in a single blocking call.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+_EVENT_ID_RE = re.compile(r"^\d+-\d+$")
+
+# How long one XREAD waits; also the worst-case delay before a newly
+# connected user's stream joins the read
+READ_BLOCK_MS = 500
+READ_BATCH = 100
+
+
+def stream_key(user_id: int) -> str:
+    return f"events:{user_id}"
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[int, int]]:
+    if not event_id or not _EVENT_ID_RE.match(event_id):
+        return None
+    ms, seq = event_id.split("-")
+    return int(ms), int(seq)
+
+
+def _decode(entry_id: str, fields: dict) -> Optional[dict]:
+    try:
+        event = json.loads(fields["data"])
+    except (KeyError, json.JSONDecodeError):
+        return None
+    event["event_id"] = entry_id
+    return event
+
+
+class EventStream:
+    async def publish(self, user_id: int, message: dict) -> Optional[str]:
+        """Append an event to the user's stream. Returns its id, or None if
+        Redis is unavailable (the event is dropped, as pub/sub would have)."""
+        key = stream_key(user_id)
+        try:
+            async with redis_client.redis.pipeline(transaction=False) as pipe:
+                pipe.xadd(
+                    key,
+                    {"data": json.dumps(message)},
+                    maxlen=settings.EVENT_STREAM_MAXLEN,
+                    approximate=True,
+                )
+                # Streams of users who never come back eventually go away
+                pipe.expire(key, settings.EVENT_STREAM_TTL_SECONDS)
+                event_id, _ = await pipe.execute()
+        except (RedisError, OSError):
+            return None
+        return event_id
+
+    async def tail_id(self, user_id: int) -> str:
+        """Id of the newest entry, i.e. where live delivery should start."""
+        entries = await redis_client.redis.xrevrange(stream_key(user_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    async def is_resumable(self, user_id: int, last_event_id: str) -> bool:
+        """False if events after last_event_id may already have been trimmed."""
+        parsed = parse_event_id(last_event_id)
+        if parsed is None:
+            return False
+        entries = await redis_client.redis.xrange(stream_key(user_id), count=1)
+        if not entries:
+            # Expired stream: nothing was published for EVENT_STREAM_TTL_SECONDS
+            return True
+        return parse_event_id(entries[0][0]) <= parsed
+
+    async def replay(self, user_id: int, after_id: str, up_to_id: str = "+") -> List[dict]:
+        """Events with after_id < id <= up_to_id, oldest first."""
+        events = []
+        entries = await redis_client.redis.xrange(stream_key(user_id), min=f"({after_id}", max=up_to_id)
+        for entry_id, fields in entries:
+            event = _decode(entry_id, fields)
+            if event is not None:
+                events.append(event)
+        return events
+
+
+class StreamDispatcher:
+    """Reads the streams of every user connected to this worker and hands
+    each event to `deliver(user_id, event)`, tracking a cursor per user."""
+
+    def __init__(self, deliver: Callable[[int, dict], Awaitable[None]]):
+        self._deliver = deliver
+        self.cursors: Dict[int, str] = {}
+        self._watching = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, user_id: int, cursor: str):
+        self.cursors[user_id] = cursor
+        self._watching.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unwatch(self, user_id: int):
+        self.cursors.pop(user_id, None)
+
+    async def _run(self):
+        while True:
+            if not self.cursors:
+                self._watching.clear()
+                await self._watching.wait()
+                continue
+
+            streams = {stream_key(uid): cursor for uid, cursor in self.cursors.items()}
+            try:
+                result = await redis_client.redis.xread(streams, count=READ_BATCH, block=READ_BLOCK_MS)
+            except (RedisError, OSError):
+                logger.warning("Event stream read failed, retrying")
+                await asyncio.sleep(1)
+                continue
+
+            for key, entries in result or []:
+                user_id = int(key.split(":", 1)[1])
+                for entry_id, fields in entries:
+                    if user_id not in self.cursors:
+                        break
+                    self.cursors[user_id] = entry_id
+                    event = _decode(entry_id, fields)
+                    if event is None:
+                        continue
+                    try:
+                        await self._deliver(user_id, event)
+                    except Exception:
+                        logger.exception("Event delivery failed for user %s", user_id)
+
+
+event_stream = EventStream()
@@ -0,0 +1,306 @@
+"""
+Prometheus metrics, rendered in the text exposition format.
+
+MetricsMiddleware is plain ASGI (no BaseHTTPMiddleware task switching) and
+records per route template, so /tasks/{task_id} is one series:
+
+- request count by status, latency histogram and in-flight gauge
+- DB time and statement count per request (SQLAlchemy cursor events)
+- Redis time per request (timed execute_command and pipeline execute)
+
+Per-request DB/Redis time is accumulated in a context variable, which
+SQLAlchemy's async greenlets and the Redis client calls share with the
+request's task. Scrape-time collectors add gauges that already exist
+elsewhere (WebSocket manager, send queues, DB pool). GET /metrics serves
+everything to the networks in METRICS_ALLOWED_NETWORKS and answers 404 to
+anyone else. Values are per process; the Docker image runs one uvicorn
+process per container.
+"""
+import ipaddress
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+LabelValues = Tuple[str, ...]
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+# (name, type, help, [(labels, value)]) produced at scrape time
+Collected = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self) -> List[str]:
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labels, lv)} {_format_value(v)}"
+            for lv, v in self.values.items()
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values: str, amount: float = 1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self.values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self.values.get(label_values)
+        if series is None:
+            series = self.values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for lv, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), lv + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, lv)
+            lines.append(f"{self.name}_sum{labels} {total!r}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.collectors: List[Callable[[], Iterable[Collected]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self._add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self._add(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self._add(Histogram(*args, **kwargs))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Collected]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+def parse_networks(spec: str) -> List[Network]:
+    """"10.0.0.0/8, 127.0.0.1" -> networks; a bare address is a single host."""
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in spec.split(",") if part.strip()]
+
+
+def scrape_allowed(host: Optional[str], networks: List[Network]) -> bool:
+    if not host:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being served")
+db_time = registry.histogram(
+    "http_request_db_seconds", "Time spent in DB statements per request", ("method", "route"))
+db_queries = registry.histogram(
+    "http_request_db_queries", "DB statements per request", ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+redis_time = registry.histogram(
+    "http_request_redis_seconds", "Time spent in Redis calls per request", ("method", "route"))
+ws_connections_opened = registry.counter("websocket_connections_opened_total", "WebSocket connections accepted")
+ws_events = registry.counter(
+    "websocket_events_total", "Real-time events handed to WebSocket send queues", ("type",))
+
+
+class RequestStats:
+    __slots__ = ("db_seconds", "db_queries", "redis_seconds")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        self.redis_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine):
+    """Time every statement and attribute it to the current request."""
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("metrics_start")
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_seconds += elapsed
+            stats.db_queries += 1
+
+
+def instrument_redis(client):
+    """Wrap a redis.asyncio client's command and pipeline paths with timers."""
+    execute_command = client.execute_command
+
+    async def timed_execute_command(*args, **options):
+        start = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            stats = _request_stats.get()
+            if stats is not None:
+                stats.redis_seconds += time.perf_counter() - start
+
+    make_pipeline = client.pipeline
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = make_pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*eargs, **ekwargs):
+            start = time.perf_counter()
+            try:
+                return await execute(*eargs, **ekwargs)
+            finally:
+                stats = _request_stats.get()
+                if stats is not None:
+                    stats.redis_seconds += time.perf_counter() - start
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+
+
+def route_template(scope) -> str:
+    """/tasks/123/threads/9/messages -> /tasks/{task_id}/threads/{helper_id}/messages.
+
+    Rebuilt from the concrete path and the matched path params, because
+    routes of included routers do not carry their prefix on every FastAPI
+    version.
+    """
+    route = scope.get("route")
+    if route is None:
+        # Unmatched paths share one series so scanners cannot blow up cardinality
+        return "unmatched"
+    pending = [(name, str(value)) for name, value in scope.get("path_params", {}).items()]
+    segments = scope["path"].split("/")
+    for i, segment in enumerate(segments):
+        if pending and segment == pending[0][1]:
+            segments[i] = "{" + pending.pop(0)[0] + "}"
+    if pending:
+        # A param spanning segments (e.g. a mount's {path}); the route's own pattern will do
+        return getattr(route, "path", None) or "unmatched"
+    return "/".join(segments)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            _request_stats.reset(token)
+            path = route_template(scope)
+            method = scope["method"]
+            http_requests.inc(method, path, status)
+            http_latency.observe(elapsed, method, path)
+            db_time.observe(stats.db_seconds, method, path)
+            db_queries.observe(stats.db_queries, method, path)
+            redis_time.observe(stats.redis_seconds, method, path)
@@ -0,0 +1,112 @@
+"""
+Connection pool leak detection.
+
+Records when each pooled connection is checked out and by which asyncio
+task, and periodically logs any connection held longer than
+DB_POOL_LEAK_SECONDS. A long hold almost always means a session kept open
+across something slow (a WebSocket loop, an external API call) rather than
+a slow query. The current holders are also exposed at GET /admin/db-pool.
+
+Set DB_POOL_LEAK_CAPTURE_STACK to also record the checkout stack (costs a
+few tens of microseconds per checkout).
+"""
+import asyncio
+import logging
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolLeakDetector:
+    def __init__(self):
+        self._engine: Optional[AsyncEngine] = None
+        # id(dbapi connection) -> checkout info
+        self._checked_out: Dict[int, dict] = {}
+        self.stats = {"checkouts": 0, "leaks_flagged": 0}
+
+    def install(self, engine: AsyncEngine):
+        if self._engine is not None:
+            return
+        self._engine = engine
+        event.listen(engine.sync_engine, "checkout", self._on_checkout)
+        event.listen(engine.sync_engine, "checkin", self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.stats["checkouts"] += 1
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        self._checked_out[id(dbapi_connection)] = {
+            "since": time.monotonic(),
+            "task": task.get_name() if task else None,
+            "stack": (
+                "".join(traceback.format_stack(limit=12)[:-1])
+                if settings.DB_POOL_LEAK_CAPTURE_STACK else None
+            ),
+            "flagged": False,
+        }
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        self._checked_out.pop(id(dbapi_connection), None)
+
+    def held(self, older_than: float = 0) -> List[dict]:
+        """Connections checked out for at least `older_than` seconds, longest first."""
+        now = time.monotonic()
+        holders = [
+            {"held_seconds": round(now - info["since"], 1), "task": info["task"], "stack": info["stack"]}
+            for info in self._checked_out.values()
+            if now - info["since"] >= older_than
+        ]
+        return sorted(holders, key=lambda h: h["held_seconds"], reverse=True)
+
+    def pool_status(self) -> dict:
+        pool = self._engine.sync_engine.pool if self._engine else None
+        return {
+            "status": pool.status() if pool else None,
+            "checked_out": len(self._checked_out),
+            **self.stats,
+        }
+
+    def collect_metrics(self):
+        """Scrape-time samples for app.core.metrics."""
+        pool = self._engine.sync_engine.pool if self._engine else None
+        samples = [
+            ("db_pool_checked_out", "gauge", "Pooled DB connections checked out",
+             [({}, len(self._checked_out))]),
+            ("db_pool_checkouts_total", "counter", "Pooled DB connection checkouts",
+             [({}, self.stats["checkouts"])]),
+            ("db_pool_leaks_flagged_total", "counter", "Checkouts held longer than DB_POOL_LEAK_SECONDS",
+             [({}, self.stats["leaks_flagged"])]),
+        ]
+        if pool is not None and hasattr(pool, "size"):
+            samples.append(("db_pool_size", "gauge", "Configured DB pool size", [({}, pool.size())]))
+        return samples
+
+    async def run(self, interval_seconds: float = 10):
+        """Background loop: warn once per checkout that exceeds the threshold."""
+        threshold = settings.DB_POOL_LEAK_SECONDS
+        while True:
+            await asyncio.sleep(interval_seconds)
+            now = time.monotonic()
+            for info in list(self._checked_out.values()):
+                if info["flagged"] or now - info["since"] < threshold:
+                    continue
+                info["flagged"] = True
+                self.stats["leaks_flagged"] += 1
+                logger.warning(
+                    "DB connection held for %.0fs by task %s%s",
+                    now - info["since"],
+                    info["task"],
+                    "\n" + info["stack"] if info["stack"] else "",
+                )
+
+
+pool_leak_detector = PoolLeakDetector()
@@ -0,0 +1,97 @@
+"""
+Cross-worker presence for WebSocket users.
+
+Each open socket is a member of the sorted set `presence:{user_id}`, scored
+with its expiry time. Sockets refresh their entry on every client ping
+(the app pings every 30s); a worker that dies without cleaning up simply
+stops refreshing and its entries age out after PRESENCE_TTL_SECONDS. A user
+is online while their set has at least one unexpired member, on any worker.
+
+Delivery itself does not depend on presence: events go to per-user streams
+(app/core/event_stream.py) that offline users catch up on when they reconnect.
+"""
+from typing import Dict, Iterable, List
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+# KEYS[1] = presence set; ARGV[1] = connection id, ARGV[2] = ttl ms
+# Returns the number of live connections for the user
+HEARTBEAT_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local ttl = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+redis.call('ZADD', KEYS[1], now + ttl, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ttl)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# KEYS[1] = presence set; ARGV[1] = connection id
+LEAVE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# KEYS = presence sets; returns live connection count per key
+ONLINE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local counts = {}
+for i, key in ipairs(KEYS) do
+    counts[i] = redis.call('ZCOUNT', key, '(' .. now, '+inf')
+end
+return counts
+"""
+
+
+class PresenceService:
+    def __init__(self):
+        self._heartbeat = redis_client.redis.register_script(HEARTBEAT_LUA)
+        self._leave = redis_client.redis.register_script(LEAVE_LUA)
+        self._online = redis_client.redis.register_script(ONLINE_LUA)
+        # Per-worker counters
+        self.stats = {"errors": 0}
+
+    @staticmethod
+    def _presence_key(user_id: int) -> str:
+        return f"presence:{user_id}"
+
+    async def heartbeat(self, user_id: int, connection_id: str) -> int:
+        """Register or refresh one socket. Returns the user's live connection count."""
+        try:
+            return int(await self._heartbeat(
+                keys=[self._presence_key(user_id)],
+                args=[connection_id, settings.PRESENCE_TTL_SECONDS * 1000],
+            ))
+        except (RedisError, OSError):
+            self.stats["errors"] += 1
+            return 0
+
+    async def leave(self, user_id: int, connection_id: str) -> int:
+        try:
+            return int(await self._leave(keys=[self._presence_key(user_id)], args=[connection_id]))
+        except (RedisError, OSError):
+            # The entry expires on its own
+            self.stats["errors"] += 1
+            return 0
+
+    async def online_counts(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        """Live connection count per user, in one round trip."""
+        ids = list(dict.fromkeys(user_ids))
+        if not ids:
+            return {}
+        counts = await self._online(keys=[self._presence_key(uid) for uid in ids])
+        return dict(zip(ids, (int(c) for c in counts)))
+
+    async def online_user_ids(self, user_ids: Iterable[int]) -> List[int]:
+        counts = await self.online_counts(user_ids)
+        return [uid for uid, count in counts.items() if count > 0]
+
+
+presence_service = PresenceService()
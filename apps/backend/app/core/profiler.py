@@ -0,0 +1,156 @@
+"""
+On-demand sampling CPU profiler for the current worker.
+
+GET /admin/profile starts a sampler thread that reads every thread's stack
+with sys._current_frames() at a fixed interval for the requested duration
+and then exits. Nothing is installed when no profile is running (no
+settrace/setprofile hooks, no signal handlers), so there is no overhead
+when idle. While sampling, the cost is one stack walk per thread per
+interval (100 Hz by default).
+
+The sampler has to take the GIL to read stacks. It gets it when a thread
+releases it (I/O, select()) or, at the latest, after the 5 ms switch
+interval, so samples lean towards those release points. `fine_gil=True`
+lowers the switch interval to SAMPLING_SWITCH_INTERVAL for the duration
+of the profile to reduce that skew. Every thread in the process then hands
+the GIL over far more often, which costs throughput on a busy worker, so
+it is off unless asked for.
+
+Samples cover the event loop thread (the coroutine running at that moment
+is on its stack) and the executor/anyio threads running sync endpoints and
+run_in_executor work. By default stacks whose innermost frame is a known
+wait (selector poll, idle executor worker, threading wait) are dropped, so
+the profile shows where CPU goes rather than where threads sleep.
+
+The result is in collapsed-stack format, one `thread;outer;...;inner count`
+line per distinct stack, ready for flamegraph.pl, speedscope or inferno.
+Only one profile runs per worker at a time. A request reaches one worker,
+so repeat it (see the worker pid in the response) to cover the others.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+# Innermost frames of threads that are blocked, not running
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("thread.py", "_worker"),
+    ("queue.py", "get"),
+    ("_backends/_asyncio.py", "run"),
+}
+
+
+# GIL switch interval while sampling with fine_gil (the default is 5 ms)
+SAMPLING_SWITCH_INTERVAL = 0.0002
+
+
+class ProfilerBusy(RuntimeError):
+    pass
+
+
+def _short_path(filename: str) -> str:
+    # site-packages/sqlalchemy/orm/query.py -> sqlalchemy/orm/query.py
+    for marker in ("site-packages/", "dist-packages/", "lib/python"):
+        idx = filename.rfind(marker)
+        if idx != -1:
+            filename = filename[idx + len(marker):]
+            if marker == "lib/python":
+                filename = filename.split("/", 1)[-1]
+            return filename
+    cwd = os.getcwd() + "/"
+    return filename[len(cwd):] if filename.startswith(cwd) else filename
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._running = threading.Lock()
+        # Per-worker counters
+        self.stats = {"profiles": 0, "samples": 0}
+
+    def _sample(self, seconds: float, interval: float, loop_thread: int, idle: bool,
+                fine_gil: bool) -> Dict[str, object]:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        labels: Dict[object, str] = {}
+        samples = 0
+        # Process-wide while it lasts; see the module docstring
+        switch_interval = sys.getswitchinterval()
+        if fine_gil:
+            sys.setswitchinterval(min(switch_interval, SAMPLING_SWITCH_INTERVAL))
+        try:
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                self._sample_once(own, loop_thread, idle, stacks, labels)
+                samples += 1
+                time.sleep(interval)
+        finally:
+            if fine_gil:
+                sys.setswitchinterval(switch_interval)
+        return {"samples": samples, "stacks": stacks}
+
+    @staticmethod
+    def _sample_once(own: int, loop_thread: int, idle: bool, stacks: Counter, labels: Dict[object, str]):
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            code = frame.f_code
+            if not idle and any(code.co_name == func and code.co_filename.endswith(file)
+                                for file, func in IDLE_LEAVES):
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})"
+                parts.append(label)
+                frame = frame.f_back
+            thread = "event-loop" if thread_id == loop_thread else names.get(thread_id, str(thread_id))
+            parts.append(thread.replace(";", ":"))
+            stacks[";".join(reversed(parts))] += 1
+
+    async def profile(self, seconds: float, interval: float = 0.01, idle: bool = False,
+                      fine_gil: bool = False) -> Dict[str, object]:
+        """Sample all threads of this process for `seconds`; raises ProfilerBusy
+        if another profile is already running on this worker."""
+        if not self._running.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running on this worker")
+        loop = asyncio.get_running_loop()
+        done: asyncio.Future = loop.create_future()
+        loop_thread = threading.get_ident()
+
+        def settle(setter, value):
+            # The request may have been cancelled while sampling
+            if not done.done():
+                setter(value)
+
+        def run():
+            try:
+                result = self._sample(seconds, interval, loop_thread, idle, fine_gil)
+            except Exception as exc:
+                loop.call_soon_threadsafe(settle, done.set_exception, exc)
+            else:
+                loop.call_soon_threadsafe(settle, done.set_result, result)
+            finally:
+                self._running.release()
+
+        # A dedicated thread, so the sampler never waits behind (or occupies) an executor slot
+        threading.Thread(target=run, name="profiler", daemon=True).start()
+        result = await done
+        self.stats["profiles"] += 1
+        self.stats["samples"] += result["samples"]
+        return {"pid": os.getpid(), "seconds": seconds, "interval": interval, **result}
+
+    @staticmethod
+    def collapsed(stacks: Counter, limit: Optional[int] = None) -> str:
+        lines = [f"{stack} {count}" for stack, count in stacks.most_common(limit)]
+        return "\n".join(lines) + "\n"
+
+
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,129 @@
+"""
+Per-request query budgets and N+1 detection (development and tests).
+
+With QUERY_BUDGET_MODE set to "log" or "raise", every SQL statement run
+while serving a request is counted and fingerprinted (parameters, literals
+and IN lists stripped, so the per-row query of an N+1 loop always has the
+same fingerprint). A request violates its budget when:
+
+- it runs more statements than the route declares with
+  `dependencies=[Depends(query_budget(<n>))]`, or
+- it repeats one statement shape more than QUERY_REPEAT_LIMIT times.
+
+"log" writes one warning per violation with the route and the offending
+statement. "raise" raises QueryBudgetExceeded from the statement that
+crossed the limit, so the request fails with a traceback pointing at the
+loop. Responses also carry X-Query-Count; tests/test_query_budgets.py pins
+it for the hot endpoints.
+
+"off" (the default) installs nothing and the dependency is a no-op.
+"""
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = b"x-query-count"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+# asyncpg ($1), psycopg (%(name)s) and qmark placeholders, with an optional cast
+_PLACEHOLDER = re.compile(r"(?:\$\d+|%\(\w+\)s|\?)(?:::\w+)?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: `IN ($1::INTEGER, $2::INTEGER)` and `IN ($1::INTEGER)` match."""
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _VALUE_LIST.sub("?", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class QueryTracker:
+    __slots__ = ("scope", "count", "budget", "shapes", "reported")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.budget: Optional[int] = None
+        self.shapes: Counter = Counter()
+        self.reported = set()
+
+    def record(self, statement: str):
+        self.count += 1
+        shape = fingerprint(statement)
+        self.shapes[shape] += 1
+        if self.budget is not None and self.count > self.budget and "budget" not in self.reported:
+            self._violation("budget", f"more than {self.budget} queries", shape)
+        if self.shapes[shape] > settings.QUERY_REPEAT_LIMIT and shape not in self.reported:
+            self._violation(shape, f"statement repeated more than {settings.QUERY_REPEAT_LIMIT} times (N+1?)", shape)
+
+    def _violation(self, key: str, problem: str, shape: str):
+        self.reported.add(key)
+        message = f"{self.scope['method']} {route_template(self.scope)}: {problem}: {shape[:300]}"
+        if settings.QUERY_BUDGET_MODE == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning("Query budget: %s", message)
+
+
+_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("query_tracker", default=None)
+
+
+def query_budget(max_queries: int):
+    """FastAPI dependency declaring the most statements a route may run,
+    including the ones of its other dependencies (e.g. loading the user)."""
+
+    async def dependency():
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.budget = max_queries
+
+    return dependency
+
+
+def instrument_engine(engine):
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        tracker = _tracker.get()
+        if tracker is not None:
+            tracker.record(statement)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = QueryTracker(scope)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((QUERY_COUNT_HEADER, str(tracker.count).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _tracker.set(tracker)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _tracker.reset(token)
@@ -0,0 +1,176 @@
+"""
+Distributed rate limiting on the shared Redis connection.
+
+Every uvicorn worker checks the same Redis key, so limits hold across
+workers and restarts. The check is a single Lua script implementing GCRA
+(generic cell rate algorithm): one key per (policy, identity) storing the
+theoretical arrival time, updated atomically with Redis server time.
+
+Policies are declared centrally in RATE_LIMIT_POLICIES and attached to
+routes with `dependencies=[Depends(rate_limit("<policy>"))]`.
+
+Per-IP policies key on the socket peer address. Behind a reverse proxy,
+uvicorn's --proxy-headers replaces it with the X-Forwarded-For client, but
+only for connections from FORWARDED_ALLOW_IPS (the proxy), so clients
+cannot pick their own key by sending the header.
+
+If Redis is unavailable the limiter fails open: requests are allowed and
+the error is counted.
+"""
+from dataclasses import dataclass
+from typing import Dict
+
+from fastapi import HTTPException, Request, status
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+# KEYS[1] = bucket key, KEYS[2] = rejection counter hash
+# ARGV[1] = emission interval (ms), ARGV[2] = burst, ARGV[3] = policy name
+# Returns {allowed (0/1), retry_after_ms}
+GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+
+local tat = tonumber(redis.call('GET', KEYS[1]))
+if not tat or tat < now then
+    tat = now
+end
+
+local new_tat = tat + emission
+local allow_at = new_tat - emission * burst
+if now < allow_at then
+    redis.call('HINCRBY', KEYS[2], ARGV[3], 1)
+    return {0, allow_at - now}
+end
+
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+REJECTIONS_KEY = "ratelimit:rejections"
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """`limit` requests per `period`, keyed per user or per client IP.
+
+    `burst` defaults to `limit`, i.e. the whole allowance may be spent at once
+    and then refills evenly over the period.
+    """
+    limit: int
+    period: str = "minute"
+    key: str = "user"  # "user" or "ip"
+    burst: int = 0
+
+    @property
+    def emission_ms(self) -> int:
+        return max(1, int(_PERIODS[self.period] * 1000 / self.limit))
+
+    @property
+    def effective_burst(self) -> int:
+        return self.burst or self.limit
+
+
+# Central policy table: route policies are looked up here by name
+RATE_LIMIT_POLICIES: Dict[str, RateLimitPolicy] = {
+    # SEC-006: Auth endpoints (per IP, users are not known yet)
+    "auth.register": RateLimitPolicy(5, "minute", key="ip"),
+    "auth.login": RateLimitPolicy(10, "minute", key="ip"),
+    "auth.refresh": RateLimitPolicy(20, "minute", key="ip"),
+    # Expensive reads (per user)
+    "tasks.nearby": RateLimitPolicy(60, "minute"),
+    "tasks.list": RateLimitPolicy(120, "minute"),
+    "tasks.detail": RateLimitPolicy(300, "minute"),
+    "tasks.search": RateLimitPolicy(60, "minute"),
+    "chat.threads": RateLimitPolicy(120, "minute"),
+    "chat.messages": RateLimitPolicy(300, "minute"),
+    "helper.stats": RateLimitPolicy(60, "minute"),
+    "users.public": RateLimitPolicy(120, "minute"),
+}
+
+
+class RedisRateLimiter:
+    def __init__(self):
+        self._script = redis_client.redis.register_script(GCRA_LUA)
+        # Per-worker counters; cluster-wide rejections live in REJECTIONS_KEY
+        self.stats = {"allowed": 0, "rejected": 0, "errors": 0}
+
+    async def hit(self, policy_name: str, identity: str) -> int:
+        """Record one request. Returns 0 if allowed, else retry-after in ms."""
+        policy = RATE_LIMIT_POLICIES[policy_name]
+        key = f"ratelimit:{policy_name}:{identity}"
+        try:
+            allowed, retry_after_ms = await self._script(
+                keys=[key, REJECTIONS_KEY],
+                args=[policy.emission_ms, policy.effective_burst, policy_name],
+            )
+        except (RedisError, OSError):
+            # Fail open: a Redis outage must not take the API down with it
+            self.stats["errors"] += 1
+            return 0
+        if int(allowed):
+            self.stats["allowed"] += 1
+            return 0
+        self.stats["rejected"] += 1
+        return max(1, int(retry_after_ms))
+
+    async def rejection_counts(self) -> Dict[str, int]:
+        """Cluster-wide rejection counters per policy."""
+        try:
+            raw = await redis_client.redis.hgetall(REJECTIONS_KEY)
+        except (RedisError, OSError):
+            return {}
+        return {name: int(count) for name, count in raw.items()}
+
+
+rate_limiter = RedisRateLimiter()
+
+
+def _client_ip(request: Request) -> str:
+    # Already the forwarded client when the peer is a trusted proxy (see module docstring)
+    return request.client.host if request.client else "unknown"
+
+
+def _identity(request: Request, policy: RateLimitPolicy) -> str:
+    """Per-user key from the bearer token's subject, falling back to IP.
+
+    The token is only decoded here, not looked up: authentication itself
+    still happens in deps.get_current_user.
+    """
+    if policy.key == "user":
+        auth = request.headers.get("authorization", "")
+        if auth.lower().startswith("bearer "):
+            try:
+                payload = jwt.decode(auth[7:], settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+                if payload.get("sub"):
+                    return f"user:{payload['sub']}"
+            except JWTError:
+                pass
+    return f"ip:{_client_ip(request)}"
+
+
+def rate_limit(policy_name: str):
+    """FastAPI dependency enforcing the named policy."""
+    if policy_name not in RATE_LIMIT_POLICIES:
+        raise KeyError(f"Unknown rate limit policy: {policy_name}")
+
+    async def dependency(request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        policy = RATE_LIMIT_POLICIES[policy_name]
+        retry_after_ms = await rate_limiter.hit(policy_name, _identity(request, policy))
+        if retry_after_ms:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={"Retry-After": str(max(1, -(-retry_after_ms // 1000)))},
+            )
+
+    return dependency
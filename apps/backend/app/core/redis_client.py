@@ -1,4 +1,3 @@
-import json
 import redis.asyncio as redis
 from app.core.config import settings
 
@@ -9,43 +8,24 @@ class RedisClient:
     async def close(self):
         await self.redis.close()
 
-    async def lock_task(self, task_id: int, helper_id: int, ttl_seconds: int = 120) -> bool:
-        """
-        Try to acquire a lock for a task.
-        Returns True if lock acquired, False otherwise.
-        Key format: task:{id}:lock
-        """
-        key = f"task:{task_id}:lock"
-        # SET NX EX -> Set only if Not eXists, set EXpire time
-        is_locked = await self.redis.set(key, helper_id, nx=True, ex=ttl_seconds)
-        return bool(is_locked)
-
-    async def unlock_task(self, task_id: int, helper_id: int):
-        """
-        Unlock task only if it is locked by this helper.
-        Lua letter verification is safest but for MVP we do simple check.
-        """
-        key = f"task:{task_id}:lock"
-        current_holder = await self.redis.get(key)
-        if current_holder and int(current_holder) == helper_id:
-            await self.redis.delete(key)
-
     async def publish_event(self, user_id: int, event_type: str, payload: dict = None):
         """
-        Publish a real-time event to a user's channel.
-        Used for WebSocket notifications.
+        Publish a real-time event to a user's event stream.
+        Used for WebSocket notifications; offline users get it replayed when
+        they reconnect with last_event_id (see app/core/event_stream.py).
         
         Args:
             user_id: The user to notify
             event_type: Event type (e.g., 'new_offer', 'task_status_changed', 'new_message')
             payload: Additional data for the event
         """
-        channel = f"user:{user_id}"
+        from app.core.event_stream import event_stream
+
         message = {
             "type": event_type,
             **(payload or {})
         }
-        await self.redis.publish(channel, json.dumps(message))
+        await event_stream.publish(user_id, message)
 
 redis_client = RedisClient()
 
@@ -0,0 +1,50 @@
+"""
+Fast JSON responses for list endpoints.
+
+When an endpoint returns plain schema objects, FastAPI validates them a second
+time against `response_model` and then walks them with `jsonable_encoder`
+before the stdlib `json` module renders the body. For lists of already-built
+models (TaskOut, TaskThreadResponse, TaskMessageResponse) that work is pure
+overhead, so these helpers serialize the list once with pydantic-core's Rust
+encoder and hand the bytes straight to Starlette.
+
+Endpoints keep their `response_model` for the OpenAPI schema; returning a
+`Response` makes FastAPI skip its own validation and encoding step.
+"""
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Type
+
+from fastapi.responses import Response
+from pydantic import BaseModel, TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    """One cached TypeAdapter per schema, building them is not free."""
+    return TypeAdapter(List[model])
+
+
+def dump_model_list(items: Sequence[BaseModel], model: Type[BaseModel]) -> bytes:
+    """Serialize a list of `model` instances to JSON bytes without re-validating."""
+    return _list_adapter(model).dump_json(list(items))
+
+
+def model_list_response(
+    items: Sequence[BaseModel],
+    model: Type[BaseModel],
+    status_code: int = 200,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """
+    Render a list of schema objects as a JSON response.
+
+    Items must already be instances of `model` (built once by the endpoint);
+    they are not validated again here.
+    """
+    return Response(
+        content=dump_model_list(items, model),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
@@ -0,0 +1,186 @@
+"""
+Per-task distributed locks with fencing tokens.
+
+Acquire, renew and release are single Lua scripts, so a lock can only be
+extended or deleted by the holder that set it. Every successful acquire
+also increments a per-task fence counter; the returned token is written
+to tasks.lock_fence by the DB update that the lock protects, and that
+update only succeeds while the token is newer than the stored one. A
+holder whose lease expired mid-operation (GC pause, slow Stripe call) is
+therefore rejected by Postgres even if it still believes it owns the lock.
+
+Usage:
+    async with task_lock_manager.hold(task_id, owner=f"user:{user.id}") as lock:
+        await task_service.select_offer(db, task_id, offer_id, fence_token=lock.token)
+"""
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from fastapi import HTTPException, status
+from redis.exceptions import RedisError
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = lock key, KEYS[2] = fence counter; ARGV[1] = holder id, ARGV[2] = ttl ms
+# Returns the fencing token, or 0 if the lock is held by someone else.
+ACQUIRE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. token, 'PX', ARGV[2])
+return token
+"""
+
+# KEYS[1] = lock key; ARGV[1] = holder value, ARGV[2] = ttl ms
+RENEW_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = lock key; ARGV[1] = holder value
+RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class TaskLock:
+    task_id: int
+    holder: str
+    token: int
+    ttl_ms: int
+    lost: bool = False  # Set if a renewal found the lease gone
+
+    @property
+    def value(self) -> str:
+        return f"{self.holder}:{self.token}"
+
+
+class TaskLockManager:
+    def __init__(self):
+        self._acquire = redis_client.redis.register_script(ACQUIRE_LUA)
+        self._renew = redis_client.redis.register_script(RENEW_LUA)
+        self._release = redis_client.redis.register_script(RELEASE_LUA)
+
+    @staticmethod
+    def _lock_key(task_id: int) -> str:
+        return f"task:{task_id}:lock"
+
+    @staticmethod
+    def _fence_key(task_id: int) -> str:
+        # Never expires: tokens must keep increasing for the task's lifetime
+        return f"task:{task_id}:fence"
+
+    async def acquire(self, task_id: int, owner: str, ttl_ms: int = 30000) -> Optional[TaskLock]:
+        """Try once to take the lock. Returns None if it is held."""
+        # Unique per acquisition, so two requests from the same user never
+        # share a lease
+        holder = f"{owner}:{uuid.uuid4().hex[:12]}"
+        token = await self._acquire(
+            keys=[self._lock_key(task_id), self._fence_key(task_id)],
+            args=[holder, ttl_ms],
+        )
+        if not int(token):
+            return None
+        return TaskLock(task_id=task_id, holder=holder, token=int(token), ttl_ms=ttl_ms)
+
+    async def renew(self, lock: TaskLock) -> bool:
+        """Extend the lease. False if it expired or was taken over."""
+        renewed = await self._renew(keys=[self._lock_key(lock.task_id)], args=[lock.value, lock.ttl_ms])
+        if not int(renewed):
+            lock.lost = True
+        return bool(int(renewed))
+
+    async def release(self, lock: TaskLock) -> bool:
+        released = await self._release(keys=[self._lock_key(lock.task_id)], args=[lock.value])
+        return bool(int(released))
+
+    async def _auto_renew(self, lock: TaskLock):
+        interval = lock.ttl_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            if not await self.renew(lock):
+                return
+
+    @asynccontextmanager
+    async def hold(
+        self,
+        task_id: int,
+        owner: str,
+        ttl_seconds: float = 30,
+        wait_seconds: float = 2,
+    ) -> AsyncIterator[TaskLock]:
+        """Hold the task lock for the duration of the block, renewing it in
+        the background. Raises 409 if it cannot be taken within wait_seconds."""
+        ttl_ms = int(ttl_seconds * 1000)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait_seconds
+        lock = await self.acquire(task_id, owner, ttl_ms)
+        while lock is None and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+            lock = await self.acquire(task_id, owner, ttl_ms)
+        if lock is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Task is being updated by another request, please retry"
+            )
+
+        renewer = asyncio.create_task(self._auto_renew(lock))
+        try:
+            yield lock
+        finally:
+            # Neither a dead renewer nor a failed release may replace the
+            # block's own outcome, and release must always be attempted
+            renewer.cancel()
+            try:
+                await renewer
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                logger.exception("Lock renewal failed for task %s", task_id)
+            try:
+                await self.release(lock)
+            except RedisError:
+                logger.exception("Lock release failed for task %s; it expires with its TTL", task_id)
+
+
+async def check_fence(db: AsyncSession, task_id: int, fence_token: int):
+    """Record `fence_token` on the task row inside the caller's transaction.
+
+    Fails with 409 (and rolls back) if a newer token has already written the
+    row, i.e. our lease expired and someone else took over.
+    """
+    from app.models.models import Task
+
+    result = await db.execute(
+        update(Task)
+        .where(
+            Task.id == task_id,
+            or_(Task.lock_fence.is_(None), Task.lock_fence < fence_token)
+        )
+        .values(lock_fence=fence_token)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Task lock expired before the update could be saved, please retry"
+        )
+
+
+task_lock_manager = TaskLockManager()
@@ -0,0 +1,128 @@
+"""
+Per-socket outbound queues for WebSocket delivery.
+
+Fan-out never awaits a socket: each frame is put on the socket's bounded
+queue and a dedicated writer task drains it, so one stalled phone cannot
+hold up the user's other devices or the worker's stream dispatcher. A
+socket whose queue overflows, or whose send does not complete within
+WS_SEND_TIMEOUT_SECONDS, is a slow consumer and is closed; it reconnects
+with last_event_id and catches up from its event stream.
+"""
+import asyncio
+import logging
+from typing import Optional, Union
+
+from fastapi import WebSocket
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Close code for slow consumers (4000-4999 are application-defined)
+SLOW_CONSUMER_CLOSE_CODE = 4008
+
+Frame = Union[dict, str]
+
+# Worker-wide counters
+send_stats = {
+    "enqueued": 0,
+    "sent": 0,
+    "dropped": 0,
+    "send_timeouts": 0,
+    "send_errors": 0,
+    "slow_consumer_disconnects": 0,
+    "max_queue_depth": 0,
+}
+
+
+class SocketSender:
+    def __init__(self, websocket: WebSocket, max_queue: Optional[int] = None):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue or settings.WS_SEND_QUEUE_SIZE)
+        # Set once the socket must no longer be written to
+        self.closed = asyncio.Event()
+        self._writer = asyncio.create_task(self._write_loop())
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def offer(self, frame: Frame) -> bool:
+        """Queue a frame without waiting. Overflow closes the socket."""
+        if self.closed.is_set():
+            return False
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            send_stats["dropped"] += 1
+            self._close_slow_consumer("send queue overflow")
+            return False
+        self._record_enqueue()
+        return True
+
+    async def put(self, frame: Frame):
+        """Queue a frame, waiting for room (used for replays, which may be
+        longer than the queue but are consumed as fast as the socket allows)."""
+        if self.closed.is_set():
+            return
+        put = asyncio.ensure_future(self.queue.put(frame))
+        closed = asyncio.ensure_future(self.closed.wait())
+        try:
+            await asyncio.wait({put, closed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            closed.cancel()
+            if not put.done():
+                # The writer gave up on the socket; the frame is dropped with it
+                put.cancel()
+        if put.done() and not put.cancelled():
+            self._record_enqueue()
+
+    def _record_enqueue(self):
+        send_stats["enqueued"] += 1
+        if self.queue.qsize() > send_stats["max_queue_depth"]:
+            send_stats["max_queue_depth"] = self.queue.qsize()
+
+    async def _write_loop(self):
+        while True:
+            frame = await self.queue.get()
+            try:
+                if isinstance(frame, str):
+                    send = self.websocket.send_text(frame)
+                else:
+                    send = self.websocket.send_json(frame)
+                await asyncio.wait_for(send, timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                send_stats["send_timeouts"] += 1
+                self._close_slow_consumer("send timed out")
+                return
+            except Exception:
+                # Socket already gone; the endpoint's receive loop cleans up
+                send_stats["send_errors"] += 1
+                self.closed.set()
+                return
+            send_stats["sent"] += 1
+
+    def _close_slow_consumer(self, reason: str):
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        send_stats["slow_consumer_disconnects"] += 1
+        logger.info("Closing slow WebSocket consumer: %s", reason)
+        asyncio.create_task(self._close_socket())
+
+    async def _close_socket(self):
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer"),
+                timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+            )
+        except Exception:
+            pass
+
+    async def stop(self):
+        self.closed.set()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Enum, JSON, Text, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Enum, JSON, Text, UniqueConstraint, Index, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, column_property, deferred
 from sqlalchemy.sql import func
 from geoalchemy2 import Geometry
 import enum
@@ -50,11 +51,20 @@ class Task(Base):
     status = Column(String, default=TaskStatus.POSTED, index=True)
     selected_offer_id = Column(Integer, ForeignKey("task_offers.id"), nullable=True)
     version = Column(Integer, default=1, nullable=False) # Optimistic Locking
+    lock_fence = Column(Integer, nullable=True) # Highest Redis lock fencing token that wrote this row
     
     # Location - Exact (private, shown only to assigned helper)
-    location = Column(Geometry("POINT", srid=4326), nullable=False)
+    location = deferred(Column(Geometry("POINT", srid=4326), nullable=False))
     # Location - Blurred for public (calculated via PostGIS grid snap)
-    public_location = Column(Geometry("POINT", srid=4326), nullable=True)
+    public_location = deferred(Column(Geometry("POINT", srid=4326), nullable=True))
+    
+    # Coordinates extracted by PostGIS in the same SELECT, so serializers
+    # never decode WKB. The raw geometries above are deferred: the API only
+    # writes them, so their WKB is not shipped on every read.
+    lat = column_property(func.ST_Y(location))
+    lon = column_property(func.ST_X(location))
+    public_lat = column_property(func.ST_Y(public_location))
+    public_lon = column_property(func.ST_X(public_location))
     
     # Address Fields (precise, shown to assigned helper only)
     street = Column(String, nullable=True)
@@ -84,6 +94,17 @@ class Task(Base):
     
     # Dispute Window
     dispute_open_until = Column(DateTime(timezone=True), nullable=True)
+    
+    # Full-text search document (Italian stemming), maintained by Postgres;
+    # title matches rank above description matches
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('italian', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('italian', coalesce(description, '')), 'B')",
+            persisted=True,
+        ),
+    ))
 
     client = relationship("User", back_populates="tasks_created")
     selected_offer = relationship("TaskOffer", foreign_keys=[selected_offer_id])
@@ -97,6 +118,10 @@ class Task(Base):
     messages = relationship("Message", back_populates="task") # Legacy, deprecated by TaskThread
     reviews = relationship("Review", back_populates="task")
 
+    __table_args__ = (
+        Index('ix_tasks_search_vector', 'search_vector', postgresql_using='gin'),
+    )
+
 class TaskOffer(Base):
     __tablename__ = "task_offers"
     
@@ -146,6 +171,11 @@ class TaskMessage(Base):
     
     thread = relationship("TaskThread", back_populates="messages")
 
+    __table_args__ = (
+        # Unread counts and mark-read only ever touch unread rows
+        Index('ix_task_messages_unread', 'thread_id', 'id', postgresql_where=text("read_at IS NULL")),
+    )
+
 class TaskProof(Base):
     __tablename__ = "task_proofs"
     
@@ -220,6 +250,10 @@ class Review(Base):
     __tablename__ = "reviews"
     __table_args__ = (
         UniqueConstraint('task_id', 'from_user_id', name='uq_review_task_from_user'),
+        # Keyset paging of a user's visible reviews, newest first
+        Index('ix_reviews_to_user_status_created', 'to_user_id', 'status', 'created_at', 'id'),
+        # Reveal timeout sweep (review_service.reveal_expired)
+        Index('ix_reviews_pending_blind_created', 'created_at', postgresql_where=text("status = 'pending_blind'")),
     )
 
     id = Column(Integer, primary_key=True, index=True)
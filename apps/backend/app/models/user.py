@@ -38,6 +38,12 @@ class User(Base):
     stripe_account_id = Column(String, nullable=True)  # acct_xxx
     stripe_onboarding_complete = Column(Boolean, default=False)
 
+    # Maintained counters for the public profile (see app/services/profile_service.py)
+    rating_count = Column(Integer, default=0, server_default="0", nullable=False)  # Visible reviews received
+    rating_sum = Column(Integer, default=0, server_default="0", nullable=False)  # Sum of their stars
+    tasks_completed_count = Column(Integer, default=0, server_default="0", nullable=False)  # As client or helper
+    tasks_cancelled_count = Column(Integer, default=0, server_default="0", nullable=False)
+
     # Relationships (to match old model expectations)
     tasks_created = relationship("Task", back_populates="client")
     reviews_received = relationship("Review", foreign_keys="Review.to_user_id", back_populates="to_user")
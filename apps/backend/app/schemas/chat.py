@@ -27,6 +27,14 @@ class TaskMessageResponse(TaskMessageBase):
     class Config:
         from_attributes = True
 
+class ThreadReadRequest(BaseModel):
+    up_to_message_id: int
+
+class ThreadReadResponse(BaseModel):
+    thread_id: int
+    up_to_message_id: int
+    marked: int
+
 class TaskThreadBase(BaseModel):
     pass
 
@@ -2,10 +2,12 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 
 class PublicUserStats(BaseModel):
-    tasks_completed: int = 0 # Helper: jobs done, Client: tasks posted & done
+    tasks_completed: int = 0 # Tasks completed as client or helper
+    tasks_cancelled: int = 0
     reviews_count: int = 0
     average_rating: float = 0.0
-    cancel_rate_label: str = "Reliable" # Simple bucket: Reliable, High, etc.
+    cancel_rate: float = 0.0 # cancelled / (completed + cancelled)
+    cancel_rate_label: str = "Reliable" # Simple bucket: Reliable, Occasional cancellations, High
 
 class PublicUserResponse(BaseModel):
     id: int
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Literal
 from pydantic import BaseModel
 from app.models.models import TaskStatus
 
@@ -99,3 +99,32 @@ class TaskOut(TaskBase):
 
     class Config:
         from_attributes = True
+
+# List views: "card" is the lean projection used by list screens,
+# "full" is the complete TaskOut with offers and proofs.
+TaskListView = Literal["card", "full"]
+
+class TaskCard(BaseModel):
+    """Lean task projection for list cards. Coordinates follow the same
+    visibility rules as TaskOut (blurred on /tasks/nearby)."""
+    id: int
+    title: str
+    category: Optional[str] = None
+    price_cents: int
+    urgency: Optional[str] = None
+    status: TaskStatus
+    city: Optional[str] = None
+    scheduled_at: Optional[datetime] = None
+    created_at: datetime
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    distance_km: Optional[float] = None  # Only set by /tasks/nearby and /tasks/search
+    offer_count: int = 0
+    rank: Optional[float] = None  # Only set by /tasks/search
+
+    class Config:
+        from_attributes = True
+
+class TaskSearchPage(BaseModel):
+    items: List[TaskCard]
+    next_cursor: Optional[str] = None
@@ -59,3 +59,7 @@ class UserResponse(UserBase):
 
     class Config:
         from_attributes = True
+
+class BadgesResponse(BaseModel):
+    unread_messages: int = 0
+    new_offers: int = 0
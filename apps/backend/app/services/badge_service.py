@@ -0,0 +1,202 @@
+"""
+Per-user badge counters (unread chat messages, new offers) in Redis.
+
+Each user's badges live in the hash `badges:{user_id}`, so GET
+/profile/me/badges is a single HGETALL instead of COUNTs over task_messages
+and task_offers. Writers adjust the counters after their commit:
+
+- a chat message (including the automatic offer/decline messages) adds one
+  unread message for the other participant; mark-read subtracts what it marked
+- a new (or re-submitted) offer adds one new offer for the task's client;
+  accepting or declining offers subtracts the submitted ones it resolved
+
+Increments only apply to existing hashes: a missing hash is built from
+Postgres on the next read, so a partial hash can never hide real counts.
+A periodic reconciliation recomputes every live hash to correct drift
+(lost updates, races between the initial build and concurrent writes).
+"""
+import asyncio
+import logging
+from typing import Dict, Iterable, List
+
+from redis.exceptions import RedisError
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.models.models import OfferStatus, Task, TaskMessage, TaskOffer, TaskThread
+
+logger = logging.getLogger(__name__)
+
+UNREAD_MESSAGES = "unread_messages"
+NEW_OFFERS = "new_offers"
+BADGE_FIELDS = (UNREAD_MESSAGES, NEW_OFFERS)
+
+# Held by the worker running a reconciliation, so only one worker runs it per interval
+RECONCILE_JOB_LOCK_KEY = "jobs:reconcile_badges"
+RECONCILE_BATCH = 200
+
+# KEYS[1] = badge hash; ARGV[1] = field, ARGV[2] = delta
+# Returns the new value, or nil if the hash does not exist yet
+INCR_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+local v = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if v < 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], 0)
+    v = 0
+end
+return v
+"""
+
+# KEYS[1] = badge hash; ARGV = field1, value1, field2, value2, ...
+# Overwrites the counters of an existing hash (keeping its TTL); returns
+# 1 if any value changed, 0 if they already matched, -1 if the hash is gone
+RECONCILE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local changed = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) ~= ARGV[i + 1] then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+        changed = 1
+    end
+end
+return changed
+"""
+
+
+class BadgeService:
+    def __init__(self):
+        self._incr = redis_client.redis.register_script(INCR_LUA)
+        self._reconcile = redis_client.redis.register_script(RECONCILE_LUA)
+        # Per-worker counters
+        self.stats = {"rebuilt": 0, "reconciled": 0, "corrected": 0, "errors": 0}
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"badges:{user_id}"
+
+    async def incr(self, user_id: int, field: str, delta: int = 1):
+        """Adjust one counter; call after the writing transaction commits."""
+        if not user_id or not delta:
+            return
+        try:
+            await self._incr(keys=[self._key(user_id)], args=[field, delta])
+        except (RedisError, OSError):
+            # Reconciliation will catch up
+            self.stats["errors"] += 1
+
+    async def count_from_db(self, db: AsyncSession, user_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+        """Authoritative badge counts for a batch of users (two grouped queries)."""
+        ids = list(user_ids)
+        counts = {uid: {field: 0 for field in BADGE_FIELDS} for uid in ids}
+        if not ids:
+            return counts
+
+        # The reader of a message is the participant who did not send it
+        reader = case(
+            (TaskMessage.sender_id == TaskThread.client_id, TaskThread.helper_id),
+            else_=TaskThread.client_id,
+        )
+        unread_result = await db.execute(
+            select(reader, func.count(TaskMessage.id))
+            .join(TaskThread, TaskThread.id == TaskMessage.thread_id)
+            .where(TaskMessage.read_at.is_(None), reader.in_(ids))
+            .group_by(reader)
+        )
+        for user_id, count in unread_result.all():
+            counts[user_id][UNREAD_MESSAGES] = count
+
+        offers_result = await db.execute(
+            select(Task.client_id, func.count(TaskOffer.id))
+            .join(Task, Task.id == TaskOffer.task_id)
+            .where(TaskOffer.status == OfferStatus.SUBMITTED.value, Task.client_id.in_(ids))
+            .group_by(Task.client_id)
+        )
+        for user_id, count in offers_result.all():
+            counts[user_id][NEW_OFFERS] = count
+        return counts
+
+    async def get(self, db: AsyncSession, user_id: int) -> Dict[str, int]:
+        """Current badges: one HGETALL, or a rebuild from Postgres on a miss."""
+        key = self._key(user_id)
+        try:
+            cached = await redis_client.redis.hgetall(key)
+        except (RedisError, OSError):
+            self.stats["errors"] += 1
+            cached = None
+        if cached:
+            return {field: int(cached.get(field, 0)) for field in BADGE_FIELDS}
+
+        counts = (await self.count_from_db(db, [user_id]))[user_id]
+        try:
+            async with redis_client.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping=counts)
+                pipe.expire(key, settings.BADGE_TTL_SECONDS)
+                await pipe.execute()
+            self.stats["rebuilt"] += 1
+        except (RedisError, OSError):
+            self.stats["errors"] += 1
+        return counts
+
+    async def reconcile(self, db: AsyncSession, user_ids: List[int]) -> int:
+        """Overwrite the live hashes of `user_ids` with Postgres counts.
+        Returns how many of them had drifted."""
+        counts = await self.count_from_db(db, user_ids)
+        async with redis_client.redis.pipeline(transaction=False) as pipe:
+            for user_id, fields in counts.items():
+                args = []
+                for field in BADGE_FIELDS:
+                    args += [field, str(fields[field])]
+                await self._reconcile(keys=[self._key(user_id)], args=args, client=pipe)
+            results = await pipe.execute()
+        corrected = sum(1 for r in results if int(r) == 1)
+        self.stats["reconciled"] += len(user_ids)
+        self.stats["corrected"] += corrected
+        return corrected
+
+    async def reconcile_all(self) -> int:
+        """Reconcile every user that currently has a badge hash."""
+        from app.core.database import AsyncSessionLocal
+
+        corrected = 0
+        batch: List[int] = []
+        async with AsyncSessionLocal() as db:
+            async for key in redis_client.redis.scan_iter(match="badges:*", count=500):
+                try:
+                    batch.append(int(key.split(":", 1)[1]))
+                except ValueError:
+                    continue
+                if len(batch) >= RECONCILE_BATCH:
+                    corrected += await self.reconcile(db, batch)
+                    batch = []
+            if batch:
+                corrected += await self.reconcile(db, batch)
+        return corrected
+
+    async def run_reconcile_job(self):
+        """Background loop started at app startup; runs every
+        BADGE_RECONCILE_INTERVAL_SECONDS on one worker at a time."""
+        interval = settings.BADGE_RECONCILE_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                acquired = await redis_client.redis.set(
+                    RECONCILE_JOB_LOCK_KEY, "1", nx=True, ex=max(1, interval - 1)
+                )
+                if not acquired:
+                    continue
+                corrected = await self.reconcile_all()
+                if corrected:
+                    logger.info("Badge reconciliation corrected %d users", corrected)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Badge reconciliation failed")
+
+
+badge_service = BadgeService()
@@ -0,0 +1,134 @@
+"""
+Public profile read model.
+
+The public profile document (PublicUserResponse) is cached in Redis per
+user with a short TTL and built from counters maintained on the users row
+(rating_count/rating_sum, tasks_completed_count, tasks_cancelled_count),
+so a profile view is one cache read and a miss is one primary-key SELECT.
+
+Writers keep it fresh: profile edits, review reveals and task completions
+update the counters in their own transaction and then drop the cached
+document, which the next view rebuilds.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.models.models import UserRole
+from app.models.user import User
+from app.schemas.public_user import PublicUserResponse, PublicUserStats
+
+
+def cancel_rate_label(completed: int, cancelled: int) -> Tuple[float, str]:
+    """Cancel rate over finished tasks and its display bucket."""
+    finished = completed + cancelled
+    if finished == 0:
+        return 0.0, "Reliable"
+    rate = cancelled / finished
+    if rate < 0.1:
+        label = "Reliable"
+    elif rate < 0.25:
+        label = "Occasional cancellations"
+    else:
+        label = "High"
+    return round(rate, 3), label
+
+
+class ProfileService:
+    @staticmethod
+    def _cache_key(user_id: int) -> str:
+        return f"user:{user_id}:public_profile"
+
+    @staticmethod
+    def build_public_profile(user: User) -> PublicUserResponse:
+        rating_count = user.rating_count or 0
+        average_rating = (user.rating_sum or 0) / rating_count if rating_count else 0.0
+        completed = user.tasks_completed_count or 0
+        cancelled = user.tasks_cancelled_count or 0
+        cancel_rate, label = cancel_rate_label(completed, cancelled)
+
+        return PublicUserResponse(
+            id=user.id,
+            name=user.name,
+            role=user.role,
+            bio=user.bio,
+            languages=user.languages if user.languages else [],
+            hourly_rate=user.hourly_rate if user.role == UserRole.HELPER else None,
+            skills=user.skills if user.skills else [],
+            stats=PublicUserStats(
+                tasks_completed=completed,
+                tasks_cancelled=cancelled,
+                reviews_count=rating_count,
+                average_rating=round(average_rating, 1),
+                cancel_rate=cancel_rate,
+                cancel_rate_label=label,
+            ),
+        )
+
+    async def get_public_profile_json(self, db: AsyncSession, user_id: int) -> Optional[str]:
+        """Cached profile document as JSON, or None if the user does not exist."""
+        key = self._cache_key(user_id)
+        try:
+            cached = await redis_client.redis.get(key)
+            if cached is not None:
+                return cached
+        except (RedisError, OSError):
+            cached = None
+
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalars().first()
+        if not user:
+            return None
+
+        document = self.build_public_profile(user).model_dump_json()
+        try:
+            await redis_client.redis.set(key, document, ex=settings.PUBLIC_PROFILE_CACHE_TTL_SECONDS)
+        except (RedisError, OSError):
+            pass
+        return document
+
+    async def invalidate(self, *user_ids: int):
+        """Drop cached documents; call after the writing transaction commits."""
+        keys = [self._cache_key(uid) for uid in user_ids if uid]
+        if not keys:
+            return
+        try:
+            await redis_client.redis.delete(*keys)
+        except (RedisError, OSError):
+            # Entries expire on their own within the TTL
+            pass
+
+    async def record_task_completed(self, db: AsyncSession, user_ids: Iterable[int]):
+        """Bump tasks_completed_count for the task's client and helper (no commit)."""
+        ids = [uid for uid in user_ids if uid]
+        if not ids:
+            return
+        await db.execute(
+            update(User)
+            .where(User.id.in_(ids))
+            .values(tasks_completed_count=User.tasks_completed_count + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def apply_rating_deltas(self, db: AsyncSession, deltas: Dict[int, Tuple[int, int]]):
+        """Add (review_count, stars_sum) per recipient to the rating aggregates (no commit).
+
+        One UPDATE per affected user, however many of their reviews changed.
+        """
+        for user_id, (count, stars_sum) in deltas.items():
+            await db.execute(
+                update(User)
+                .where(User.id == user_id)
+                .values(
+                    rating_count=User.rating_count + count,
+                    rating_sum=User.rating_sum + stars_sum,
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+
+profile_service = ProfileService()
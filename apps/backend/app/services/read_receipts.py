@@ -0,0 +1,153 @@
+"""
+Chat read receipts.
+
+Marking a thread read "up to message N" is one set-based UPDATE over the
+thread's unread messages from the other party. The HTTP endpoint applies
+it immediately; receipts sent over the WebSocket (the app sends one as
+messages scroll into view) go through a write-behind buffer that keeps
+only the highest message id per (reader, thread) and writes every pending
+receipt in a single UPDATE ... FROM (VALUES ...) every
+READ_RECEIPT_FLUSH_SECONDS. A batch whose write fails goes back into the
+buffer for the next flush.
+
+Each write that changed something lowers the reader's unread badge and
+publishes a `read_receipt` event to the other participant.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import Integer, column, func, or_, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.models.models import TaskMessage, TaskThread
+
+logger = logging.getLogger(__name__)
+
+# (thread_id, reader_id, up_to_message_id)
+Receipt = Tuple[int, int, int]
+
+
+async def mark_read(db: AsyncSession, receipts: Iterable[Receipt]) -> Dict[Tuple[int, int], dict]:
+    """Mark messages read for each receipt in one UPDATE and commit.
+
+    Only messages sent by the other participant of a thread the reader
+    belongs to are touched. Returns {(thread_id, reader_id): info} for the
+    receipts that changed something, info holding the sender to notify,
+    the highest message id marked and the number of messages.
+    """
+    receipts = list(receipts)
+    if not receipts:
+        return {}
+    pending = values(
+        column("thread_id", Integer),
+        column("reader_id", Integer),
+        column("up_to", Integer),
+        name="receipts",
+    ).data(receipts)
+    result = await db.execute(
+        update(TaskMessage)
+        .where(
+            TaskMessage.thread_id == pending.c.thread_id,
+            TaskMessage.id <= pending.c.up_to,
+            TaskMessage.sender_id != pending.c.reader_id,
+            TaskMessage.read_at.is_(None),
+            TaskThread.id == pending.c.thread_id,
+            or_(TaskThread.client_id == pending.c.reader_id, TaskThread.helper_id == pending.c.reader_id),
+        )
+        .values(read_at=func.now())
+        .returning(TaskMessage.thread_id, pending.c.reader_id, TaskMessage.sender_id, TaskMessage.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed: Dict[Tuple[int, int], dict] = {}
+    for thread_id, reader_id, sender_id, message_id in result.all():
+        info = changed.setdefault(
+            (thread_id, reader_id),
+            {"sender_id": sender_id, "up_to_message_id": message_id, "count": 0},
+        )
+        info["up_to_message_id"] = max(info["up_to_message_id"], message_id)
+        info["count"] += 1
+    await db.commit()
+
+    from app.services.badge_service import UNREAD_MESSAGES, badge_service
+
+    unread_cleared: Dict[int, int] = {}
+    for (_, reader_id), info in changed.items():
+        unread_cleared[reader_id] = unread_cleared.get(reader_id, 0) + info["count"]
+    for reader_id, count in unread_cleared.items():
+        await badge_service.incr(reader_id, UNREAD_MESSAGES, -count)
+    return changed
+
+
+async def publish_read_receipts(changed: Dict[Tuple[int, int], dict]):
+    read_at = datetime.now(timezone.utc).isoformat()
+    for (thread_id, reader_id), info in changed.items():
+        await redis_client.publish_event(
+            user_id=info["sender_id"],
+            event_type="read_receipt",
+            payload={
+                "thread_id": thread_id,
+                "reader_id": reader_id,
+                "up_to_message_id": info["up_to_message_id"],
+                "read_at": read_at,
+            }
+        )
+
+
+class ReadReceiptBuffer:
+    """Write-behind buffer for WebSocket read receipts (per worker)."""
+
+    def __init__(self):
+        # (thread_id, reader_id) -> highest message id seen
+        self._pending: Dict[Tuple[int, int], int] = {}
+        self.stats = {"received": 0, "flushes": 0, "failed_flushes": 0, "messages_marked": 0}
+
+    def mark(self, reader_id: int, thread_id: int, up_to_message_id: int):
+        self.stats["received"] += 1
+        self._merge(thread_id, reader_id, up_to_message_id)
+
+    def _merge(self, thread_id: int, reader_id: int, up_to_message_id: int):
+        key = (thread_id, reader_id)
+        if up_to_message_id > self._pending.get(key, 0):
+            self._pending[key] = up_to_message_id
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch: List[Receipt] = [
+            (thread_id, reader_id, up_to) for (thread_id, reader_id), up_to in self._pending.items()
+        ]
+        self._pending = {}
+
+        from app.core.database import AsyncSessionLocal
+
+        try:
+            async with AsyncSessionLocal() as db:
+                changed = await mark_read(db, batch)
+        except BaseException:
+            # Not written: put the batch back (newer receipts that arrived
+            # meanwhile win) for the next flush, including the one at shutdown
+            for receipt in batch:
+                self._merge(*receipt)
+            self.stats["failed_flushes"] += 1
+            raise
+        self.stats["flushes"] += 1
+        self.stats["messages_marked"] += sum(info["count"] for info in changed.values())
+        await publish_read_receipts(changed)
+
+    async def run(self):
+        """Background loop started at app startup."""
+        while True:
+            await asyncio.sleep(settings.READ_RECEIPT_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Read receipt flush failed")
+
+
+read_receipt_buffer = ReadReceiptBuffer()
@@ -0,0 +1,158 @@
+"""
+Blind review reveals.
+
+A review is created PENDING_BLIND and becomes VISIBLE either when the
+other party reviews the same task, or when it has waited longer than
+REVIEW_REVEAL_TIMEOUT_HOURS (one-sided reviews must still count). Both
+paths flip the status with a single conditional UPDATE ... RETURNING and
+fold the returned rows into one rating-aggregate update per recipient.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Tuple
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+from app.models.models import Review, ReviewStatus
+from app.services.profile_service import profile_service
+
+logger = logging.getLogger(__name__)
+
+# Held by the worker running a sweep, so only one worker sweeps per interval
+REVEAL_JOB_LOCK_KEY = "jobs:reveal_expired_reviews"
+
+
+def _rating_deltas(rows: Iterable[Tuple[int, int]]) -> Dict[int, Tuple[int, int]]:
+    """Fold (to_user_id, stars) rows into {user_id: (count, stars_sum)}."""
+    deltas: Dict[int, Tuple[int, int]] = {}
+    for to_user_id, stars in rows:
+        count, stars_sum = deltas.get(to_user_id, (0, 0))
+        deltas[to_user_id] = (count + 1, stars_sum + stars)
+    return deltas
+
+
+class ReviewService:
+    async def reveal_task_reviews(self, db: AsyncSession, task_id: int) -> int:
+        """Reveal a task's reviews if both parties have reviewed. Commits.
+
+        Must run after the caller's review insert has committed: whichever of
+        two concurrent submitters runs second then sees both rows, and the
+        status predicate keeps the loser of the row-lock race from counting
+        the reveal twice.
+        """
+        other = aliased(Review)
+        both_reviewed = (
+            select(func.count(other.id))
+            .where(other.task_id == task_id)
+            .scalar_subquery()
+        ) == 2
+        result = await db.execute(
+            update(Review)
+            .where(
+                Review.task_id == task_id,
+                Review.status == ReviewStatus.PENDING_BLIND.value,
+                both_reviewed,
+            )
+            .values(status=ReviewStatus.VISIBLE.value)
+            .returning(Review.to_user_id, Review.stars)
+            .execution_options(synchronize_session=False)
+        )
+        deltas = _rating_deltas(result.all())
+        if not deltas:
+            await db.rollback()
+            return 0
+        await profile_service.apply_rating_deltas(db, deltas)
+        await db.commit()
+        await profile_service.invalidate(*deltas.keys())
+        return sum(count for count, _ in deltas.values())
+
+    async def reveal_expired(
+        self,
+        db: AsyncSession,
+        older_than: timedelta,
+        batch_size: int = 500,
+    ) -> int:
+        """Reveal PENDING_BLIND reviews created before now - older_than.
+
+        Works in batches of `batch_size` (one transaction each) picked through
+        ix_reviews_pending_blind_created; rows locked by a concurrent reveal
+        are skipped and picked up by the next sweep. Returns the number revealed.
+        """
+        cutoff = datetime.now(timezone.utc) - older_than
+        revealed = 0
+        while True:
+            batch = (
+                select(Review.id)
+                .where(
+                    Review.status == ReviewStatus.PENDING_BLIND.value,
+                    Review.created_at < cutoff,
+                )
+                .order_by(Review.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                update(Review)
+                .where(
+                    Review.id.in_(batch),
+                    Review.status == ReviewStatus.PENDING_BLIND.value,
+                )
+                .values(status=ReviewStatus.VISIBLE.value)
+                .returning(Review.to_user_id, Review.stars)
+                .execution_options(synchronize_session=False)
+            )
+            rows = result.all()
+            if not rows:
+                await db.rollback()
+                return revealed
+
+            deltas = _rating_deltas(rows)
+            await profile_service.apply_rating_deltas(db, deltas)
+            await db.commit()
+            await profile_service.invalidate(*deltas.keys())
+            revealed += len(rows)
+            if len(rows) < batch_size:
+                return revealed
+
+    async def run_reveal_job(self):
+        """Background loop started at app startup; sweeps every
+        REVIEW_REVEAL_INTERVAL_SECONDS on one worker at a time."""
+        from app.core.database import AsyncSessionLocal
+
+        interval = settings.REVIEW_REVEAL_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Lease for slightly less than the interval, so the next tick can
+                # take it again but other workers skip this one
+                acquired = await redis_client.redis.set(
+                    REVEAL_JOB_LOCK_KEY, "1", nx=True, ex=max(1, interval - 1)
+                )
+            except (RedisError, OSError):
+                continue
+            if not acquired:
+                continue
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    revealed = await self.reveal_expired(
+                        db,
+                        timedelta(hours=settings.REVIEW_REVEAL_TIMEOUT_HOURS),
+                        settings.REVIEW_REVEAL_BATCH_SIZE,
+                    )
+                if revealed:
+                    logger.info("Revealed %d expired blind reviews", revealed)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Blind review reveal sweep failed")
+
+
+review_service = ReviewService()
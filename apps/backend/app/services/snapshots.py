@@ -0,0 +1,93 @@
+"""
+Compact, viewer-safe entity snapshots for real-time events.
+
+Events used to carry only ids, so every connected client immediately
+refetched the task or the thread. Publishers now attach a small snapshot
+of what changed (task status/version, offer price/status, message body)
+so clients can update in place. Snapshots are built per recipient and
+follow the same exact-address rule as GET /tasks/{id}: only the owner and
+the assigned helper (once assigned) see the exact location and address.
+
+Set WS_EVENT_SNAPSHOTS=false to publish id-only events again.
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.models.models import Task, TaskMessage, TaskOffer
+
+# Statuses from which the assigned helper may see the exact address
+EXACT_ADDRESS_HELPER_STATUSES = ['assigned', 'in_progress', 'in_confirmation', 'completed']
+
+
+def _value(v):
+    return getattr(v, "value", v)
+
+
+def _iso(dt) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+def can_view_exact_address(
+    viewer_id: int,
+    client_id: int,
+    status,
+    viewer_is_assignee: bool,
+) -> bool:
+    """Owner always; the assigned helper once the task is assigned."""
+    if viewer_id == client_id:
+        return True
+    return viewer_is_assignee and _value(status) in EXACT_ADDRESS_HELPER_STATUSES
+
+
+def task_snapshot(task: Task, viewer_id: int, viewer_is_assignee: bool = False) -> dict:
+    show_exact = can_view_exact_address(viewer_id, task.client_id, task.status, viewer_is_assignee)
+    if show_exact or task.public_lat is None:
+        lat, lon = task.lat, task.lon
+    else:
+        lat, lon = task.public_lat, task.public_lon
+    snapshot = {
+        "id": task.id,
+        "status": _value(task.status),
+        "version": task.version,
+        "price_cents": task.price_cents,
+        "selected_offer_id": task.selected_offer_id,
+        "scheduled_at": _iso(task.scheduled_at),
+        "city": task.city,
+        "lat": lat,
+        "lon": lon,
+    }
+    if show_exact:
+        snapshot["formatted_address"] = task.formatted_address
+        snapshot["address_line"] = task.address_line
+    return snapshot
+
+
+def offer_snapshot(offer: TaskOffer, helper_name: Optional[str] = None) -> dict:
+    return {
+        "id": offer.id,
+        "task_id": offer.task_id,
+        "helper_id": offer.helper_id,
+        "helper_name": helper_name,
+        "status": _value(offer.status),
+        "price_cents": offer.price_cents,
+        "message": offer.message,
+    }
+
+
+def message_snapshot(message: TaskMessage) -> dict:
+    return {
+        "id": message.id,
+        "thread_id": message.thread_id,
+        "sender_id": message.sender_id,
+        "type": _value(message.type),
+        "body": message.body,
+        "payload": message.payload,
+        "created_at": _iso(message.created_at),
+    }
+
+
+def with_snapshots(payload: dict, **snapshots) -> dict:
+    """Attach snapshots to an event payload unless they are turned off."""
+    if settings.WS_EVENT_SNAPSHOTS:
+        payload.update({key: value for key, value in snapshots.items() if value is not None})
+    return payload
@@ -6,11 +6,25 @@ from fastapi import HTTPException
 from app.models.models import Task, TaskAssignment, TaskStatus, Payment, PaymentStatus, TaskOffer, OfferStatus
 from app.models.user import User
 from app.core.redis_client import redis_client
+from app.core.task_lock import check_fence
+from app.services.badge_service import NEW_OFFERS, badge_service
+from app.services.profile_service import profile_service
+from app.services.snapshots import offer_snapshot, task_snapshot, with_snapshots
+
+async def _fresh_task_for_update(db: AsyncSession, task_id: int):
+    """Re-read the task row under FOR UPDATE, overwriting any copy already in
+    the session, so a caller that waited on the task lock sees the winner's write."""
+    result = await db.execute(
+        select(Task).where(Task.id == task_id).with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
 
 class TaskService:
-    async def select_offer(self, db: AsyncSession, task_id: int, offer_id: int):
+    async def select_offer(self, db: AsyncSession, task_id: int, offer_id: int, fence_token: int = None):
         """
         Transition: POSTED -> ASSIGNED
+        Callers should hold the task lock and pass its fence_token.
         Action:
         1. Verify Task is POSTED
         2. Verify Offer exists and matches Task
@@ -19,8 +33,8 @@ class TaskService:
         5. Update Offers (Selected -> ACCEPTED, Others -> DECLINED)
         6. Create TaskAssignment
         """
-        # 1. Fetch Task
-        task = await db.get(Task, task_id)
+        # 1. Fetch Task (fresh and row-locked; the endpoint loaded it before the lock)
+        task = await _fresh_task_for_update(db, task_id)
         if not task:
             raise HTTPException(status_code=404, detail="Task not found")
             
@@ -34,7 +48,7 @@ class TaskService:
              raise HTTPException(status_code=400, detail="Task is not available for assignment (current status: " + str(task.status) + ")")
              
         # 2. Fetch Offer
-        offer = await db.get(TaskOffer, offer_id)
+        offer = await db.get(TaskOffer, offer_id, populate_existing=True)
         if not offer or offer.task_id != task_id:
             raise HTTPException(status_code=404, detail="Offer not found for this task")
             
@@ -57,6 +71,8 @@ class TaskService:
         task.version += 1
         
         # 5. Update Offers
+        # Submitted offers resolved here no longer count as new for the client
+        resolved_submitted = int(offer.status == OfferStatus.SUBMITTED)
         # Set selected to ACCEPTED
         offer.status = OfferStatus.ACCEPTED
         
@@ -65,6 +81,8 @@ class TaskService:
         # Re-fetch offers to decline
         other_offers_result = await db.execute(select(TaskOffer).where(TaskOffer.task_id == task_id, TaskOffer.id != offer_id))
         for o in other_offers_result.scalars().all():
+            if o.status == OfferStatus.SUBMITTED:
+                resolved_submitted += 1
             o.status = OfferStatus.DECLINED
             
         # 6. Create Assignment
@@ -76,14 +94,21 @@ class TaskService:
         )
         db.add(assignment)
         
+        if fence_token is not None:
+            await check_fence(db, task_id, fence_token)
         await db.commit()
         await db.refresh(task)
+        await badge_service.incr(task.client_id, NEW_OFFERS, -resolved_submitted)
         
         # Publish WebSocket event to notify helper that offer was accepted
         await redis_client.publish_event(
             user_id=offer.helper_id,
             event_type="offer_accepted",
-            payload={"task_id": task_id, "offer_id": offer_id}
+            payload=with_snapshots(
+                {"task_id": task_id, "offer_id": offer_id},
+                task=task_snapshot(task, offer.helper_id, viewer_is_assignee=True),
+                offer=offer_snapshot(offer),
+            )
         )
         
         return task
@@ -146,12 +171,13 @@ class TaskService:
         await db.refresh(task)
         return task
 
-    async def confirm_completion(self, db: AsyncSession, task_id: int, client_id: int):
+    async def confirm_completion(self, db: AsyncSession, task_id: int, client_id: int, fence_token: int = None):
         """
         Transition: IN_CONFIRMATION -> COMPLETED
         Action: Capture Payment
+        Callers should hold the task lock and pass its fence_token.
         """
-        task = await db.get(Task, task_id)
+        task = await _fresh_task_for_update(db, task_id)
         if not task:
              raise HTTPException(status_code=404, detail="Task not found")
              
@@ -182,16 +208,26 @@ class TaskService:
         if assignment:
             assignment.completed_at = datetime.utcnow()
             assignment.status = TaskStatus.COMPLETED
+        
+        # Maintained profile counters for both parties
+        helper_id = assignment.helper_id if assignment else None
+        await profile_service.record_task_completed(db, [task.client_id, helper_id])
             
+        if fence_token is not None:
+            await check_fence(db, task_id, fence_token)
         await db.commit()
         await db.refresh(task)
+        await profile_service.invalidate(task.client_id, helper_id)
         
         # Publish WebSocket event to notify helper about task completion
         if assignment:
             await redis_client.publish_event(
                 user_id=assignment.helper_id,
                 event_type="task_status_changed",
-                payload={"task_id": task_id, "status": "completed"}
+                payload=with_snapshots(
+                    {"task_id": task_id, "status": "completed"},
+                    task=task_snapshot(task, assignment.helper_id, viewer_is_assignee=True),
+                )
             )
         
         return task
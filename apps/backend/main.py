@@ -2,24 +2,22 @@
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.endpoints import tasks, auth, profile, helper, chat, ws, users, reviews, admin, stripe, categories
 from app.core.redis_client import redis_client
+from app.core.config import settings
+from app.core import metrics, query_budget
 from app.core.database import engine, Base
+from app.core.pool_monitor import pool_leak_detector
+from app.services.read_receipts import read_receipt_buffer
+from app.services.badge_service import badge_service
+from app.services.review_service import review_service
+import asyncio
 import os
 
-# SEC-006: Rate limiter setup
-limiter = Limiter(key_func=get_remote_address)
-
+# SEC-006: Rate limiting is Redis-backed and attached per route (app/core/rate_limit.py)
 app = FastAPI(title="TaskMate API")
 
-# Attach limiter to app state for use in endpoints
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS Configuration - can be overridden via CORS_ORIGINS environment variable
 # Format: comma-separated list e.g. "https://app.taskmate.it,https://admin.taskmate.it"
 default_origins = [
@@ -50,17 +48,43 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+if settings.QUERY_BUDGET_MODE != "off":
+    app.add_middleware(query_budget.QueryBudgetMiddleware)
+    query_budget.instrument_engine(engine)
+
+# Outermost, so the latency includes CORS handling
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.instrument_engine(engine)
+    metrics.instrument_redis(redis_client.redis)
+    metrics.registry.register_collector(ws.manager.collect_metrics)
+    metrics.registry.register_collector(pool_leak_detector.collect_metrics)
+
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    for job_name in ("review_reveal_job", "pool_leak_job", "read_receipt_job", "badge_reconcile_job"):
+        job = getattr(app.state, job_name, None)
+        if job:
+            job.cancel()
+    # Receipts still buffered on this worker
+    await read_receipt_buffer.flush()
     await redis_client.close()
 
 @app.on_event("startup")
 async def startup_event():
+    pool_leak_detector.install(engine)
+    app.state.pool_leak_job = asyncio.create_task(pool_leak_detector.run())
     # Create tables (Simple MVP approach)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    # Reveal one-sided blind reviews past their timeout
+    app.state.review_reveal_job = asyncio.create_task(review_service.run_reveal_job())
+    # Batched writes of WebSocket read receipts
+    app.state.read_receipt_job = asyncio.create_task(read_receipt_buffer.run())
+    # Correct drift in the Redis badge counters
+    app.state.badge_reconcile_job = asyncio.create_task(badge_service.run_reconcile_job())
 
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(profile.router, prefix="/profile", tags=["profile"])
@@ -76,4 +100,16 @@ app.include_router(categories.router)  # Public categories endpoint
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+# Parsed once; a bad entry fails at startup rather than on every scrape
+metrics_networks = metrics.parse_networks(settings.METRICS_ALLOWED_NETWORKS)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint(request: Request):
+    """Prometheus text format (per process), for METRICS_ALLOWED_NETWORKS only."""
+    if not settings.METRICS_ENABLED:
+        return PlainTextResponse("metrics disabled\n", status_code=404)
+    if not metrics.scrape_allowed(request.client.host if request.client else None, metrics_networks):
+        return PlainTextResponse("Not Found\n", status_code=404)
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
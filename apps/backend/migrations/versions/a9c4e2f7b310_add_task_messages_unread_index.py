@@ -0,0 +1,29 @@
+"""add partial index for unread task messages
+
+Revision ID: a9c4e2f7b310
+Revises: f3b8d1e6a402
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2f7b310'
+down_revision = 'f3b8d1e6a402'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_task_messages_unread',
+        'task_messages',
+        ['thread_id', 'id'],
+        postgresql_where=sa.text("read_at IS NULL"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_task_messages_unread', table_name='task_messages')
@@ -0,0 +1,38 @@
+"""add generated search vector and GIN index to tasks
+
+Revision ID: b6d1f4a8c253
+Revises: a9c4e2f7b310
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d1f4a8c253'
+down_revision = 'a9c4e2f7b310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'tasks',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "setweight(to_tsvector('italian', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('italian', coalesce(description, '')), 'B')",
+                persisted=True,
+            ),
+        ),
+    )
+    op.create_index('ix_tasks_search_vector', 'tasks', ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_tasks_search_vector', table_name='tasks')
+    op.drop_column('tasks', 'search_vector')
@@ -0,0 +1,24 @@
+"""add lock_fence to tasks
+
+Revision ID: c41e9a7d2b10
+Revises: 7a8b9c0d1e2f
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e9a7d2b10'
+down_revision = '7a8b9c0d1e2f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('tasks', sa.Column('lock_fence', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('tasks', 'lock_fence')
@@ -0,0 +1,73 @@
+"""add maintained profile counters to users
+
+Revision ID: d5f0b8a3c927
+Revises: c41e9a7d2b10
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f0b8a3c927'
+down_revision = 'c41e9a7d2b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('tasks_completed_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('tasks_cancelled_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill from existing data
+    op.execute("""
+        UPDATE users u
+        SET rating_count = s.review_count, rating_sum = s.stars_sum
+        FROM (
+            SELECT to_user_id, COUNT(*) AS review_count, SUM(stars) AS stars_sum
+            FROM reviews
+            WHERE status = 'visible'
+            GROUP BY to_user_id
+        ) s
+        WHERE u.id = s.to_user_id
+    """)
+    op.execute("""
+        UPDATE users u
+        SET tasks_completed_count = s.completed
+        FROM (
+            SELECT user_id, COUNT(*) AS completed FROM (
+                SELECT client_id AS user_id FROM tasks WHERE status = 'completed'
+                UNION ALL
+                SELECT a.helper_id AS user_id
+                FROM task_assignments a JOIN tasks t ON t.id = a.task_id
+                WHERE t.status = 'completed'
+            ) c
+            GROUP BY user_id
+        ) s
+        WHERE u.id = s.user_id
+    """)
+    op.execute("""
+        UPDATE users u
+        SET tasks_cancelled_count = s.cancelled
+        FROM (
+            SELECT user_id, COUNT(*) AS cancelled FROM (
+                SELECT client_id AS user_id FROM tasks WHERE status = 'cancelled_by_client'
+                UNION ALL
+                SELECT a.helper_id AS user_id
+                FROM task_assignments a JOIN tasks t ON t.id = a.task_id
+                WHERE t.status = 'cancelled_by_helper'
+            ) c
+            GROUP BY user_id
+        ) s
+        WHERE u.id = s.user_id
+    """)
+
+
+def downgrade():
+    op.drop_column('users', 'tasks_cancelled_count')
+    op.drop_column('users', 'tasks_completed_count')
+    op.drop_column('users', 'rating_sum')
+    op.drop_column('users', 'rating_count')
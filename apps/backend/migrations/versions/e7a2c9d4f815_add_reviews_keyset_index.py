@@ -0,0 +1,29 @@
+"""add reviews keyset index
+
+Revision ID: e7a2c9d4f815
+Revises: d5f0b8a3c927
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2c9d4f815'
+down_revision = 'd5f0b8a3c927'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves GET /users/{id}/reviews: equality on (to_user_id, status), then
+    # a backward scan on (created_at, id) for keyset paging
+    op.create_index(
+        'ix_reviews_to_user_status_created',
+        'reviews',
+        ['to_user_id', 'status', 'created_at', 'id'],
+    )
+
+
+def downgrade():
+    op.drop_index('ix_reviews_to_user_status_created', table_name='reviews')
@@ -0,0 +1,31 @@
+"""add partial index for pending blind reviews
+
+Revision ID: f3b8d1e6a402
+Revises: e7a2c9d4f815
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1e6a402'
+down_revision = 'e7a2c9d4f815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only still-blind reviews are indexed, so the reveal sweep stays cheap
+    # however many visible reviews accumulate
+    op.create_index(
+        'ix_reviews_pending_blind_created',
+        'reviews',
+        ['created_at'],
+        postgresql_where=sa.text("status = 'pending_blind'"),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_reviews_pending_blind_created', table_name='reviews')
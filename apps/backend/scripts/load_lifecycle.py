@@ -0,0 +1,280 @@
+"""
+Load generator: N concurrent clients and helpers through the full task lifecycle.
+
+Each scenario is one client and --helpers helpers running the flow that
+create_test_data.py and probe_api.py walk through by hand:
+
+    register -> login -> create task -> offers -> chat -> select offer
+    -> start -> upload proof -> request completion -> confirm -> reviews
+
+Every user keeps a WebSocket open for the whole run. The report gives
+p50/p95/p99 and errors per step, lifecycle and request throughput, and
+event delivery lag per event type. The lag is the receive time minus the
+publish time in the event_id (Redis stream ids start with the server's
+millisecond clock), so run it on the same host as Redis. Coalesced
+event types include their merge window in the lag.
+
+Usage (from apps/backend, against a local stack):
+    RATE_LIMIT_ENABLED=false uvicorn main:app --workers 4
+    python scripts/load_lifecycle.py [--base-url http://localhost:8000] [--scenarios 20] [--helpers 2]
+
+Run the server with RATE_LIMIT_ENABLED=false, because registration and login
+are limited per IP. Otherwise most scenarios fail with 429.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+try:
+    import requests
+    import websockets
+except ImportError:
+    sys.exit("pip install requests websockets")
+
+# 1x1 transparent PNG for proof uploads
+PROOF_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+PASSWORD = "LoadTest123"
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.event_lag: Dict[str, List[float]] = defaultdict(list)
+        self.events_received = 0
+        self.requests = 0
+        self.completed = 0
+        self.failed: Dict[str, int] = defaultdict(int)
+
+    def record(self, step: str, ms: float, status: int):
+        self.requests += 1
+        self.latencies[step].append(ms)
+        if status >= 400:
+            self.errors[step][str(status)] += 1
+
+    def record_event(self, frame: dict, received_ms: float):
+        self.events_received += 1
+        event_id = frame.get("event_id")
+        if not event_id or "-" not in event_id:
+            return
+        published_ms = int(event_id.split("-", 1)[0])
+        self.event_lag[frame.get("type", "?")].append(max(0.0, received_ms - published_ms))
+
+
+class StepFailed(Exception):
+    def __init__(self, step: str, status: int, detail: str):
+        super().__init__(f"{step}: HTTP {status} {detail[:200]}")
+        self.step = step
+
+
+class User:
+    """One virtual user: a requests session (run in the thread pool) and a
+    WebSocket listener."""
+
+    def __init__(self, runner: "LoadRunner", role: str):
+        self.runner = runner
+        self.role = role
+        self.email = f"load_{role}_{uuid.uuid4().hex[:12]}@example.com"
+        self.session = requests.Session()
+        self.id: Optional[int] = None
+        self.token: Optional[str] = None
+        self.ws_task: Optional[asyncio.Task] = None
+
+    async def call(self, step: str, method: str, path: str, **kwargs) -> dict:
+        runner = self.runner
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+        def do():
+            start = time.perf_counter()
+            resp = self.session.request(method, runner.base_url + path, headers=headers, timeout=30, **kwargs)
+            return resp, (time.perf_counter() - start) * 1000
+
+        try:
+            resp, ms = await asyncio.get_running_loop().run_in_executor(runner.executor, do)
+        except requests.RequestException as exc:
+            runner.metrics.errors[step][type(exc).__name__] += 1
+            raise StepFailed(step, 0, str(exc))
+        runner.metrics.record(step, ms, resp.status_code)
+        if resp.status_code >= 400:
+            raise StepFailed(step, resp.status_code, resp.text)
+        return resp.json() if resp.content else {}
+
+    async def signup(self):
+        await self.call("register", "POST", "/auth/register", json={
+            "email": self.email, "password": PASSWORD, "role": self.role,
+            "first_name": "Load", "last_name": self.role.title(),
+        })
+        body = await self.call("login", "POST", "/auth/login", json={"email": self.email, "password": PASSWORD})
+        self.token = body["access_token"]
+        self.id = body["user"]["id"]
+
+    async def listen(self, ready: asyncio.Event):
+        url = f"{self.runner.ws_url}/ws?token={self.token}"
+        metrics = self.runner.metrics
+        try:
+            async with websockets.connect(url) as ws:
+                ready.set()
+                async for raw in ws:
+                    received_ms = time.time() * 1000
+                    if raw == "pong":
+                        continue
+                    try:
+                        frame = json.loads(raw)
+                    except ValueError:
+                        continue
+                    metrics.record_event(frame, received_ms)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            metrics.failed[f"websocket: {type(exc).__name__}"] += 1
+        finally:
+            ready.set()
+
+    async def open_socket(self):
+        ready = asyncio.Event()
+        self.ws_task = asyncio.create_task(self.listen(ready))
+        await ready.wait()
+
+    async def close(self):
+        if self.ws_task:
+            self.ws_task.cancel()
+            try:
+                await self.ws_task
+            except asyncio.CancelledError:
+                pass
+        self.session.close()
+
+
+class LoadRunner:
+    def __init__(self, args):
+        self.base_url = args.base_url.rstrip("/")
+        self.ws_url = self.base_url.replace("http", "ws", 1)
+        self.helpers = args.helpers
+        self.messages = args.messages
+        self.metrics = Metrics()
+        # requests is blocking: one thread per user in flight
+        self.executor = ThreadPoolExecutor(max_workers=max(8, args.concurrency * (args.helpers + 1)))
+
+    async def scenario(self, n: int):
+        client = User(self, "client")
+        helpers = [User(self, "helper") for _ in range(self.helpers)]
+        users = [client] + helpers
+        try:
+            await asyncio.gather(*(u.signup() for u in users))
+            await asyncio.gather(*(u.open_socket() for u in users))
+
+            task = await client.call("create_task", "POST", "/tasks/", json={
+                "title": f"Montaggio mobile (carico #{n})",
+                "description": "Armadio da montare, attrezzi disponibili.",
+                "category": "montaggio",
+                "price_cents": 4000,
+                "urgency": "asap",
+                "lat": 41.9028 + n * 0.0001,
+                "lon": 12.4964,
+                "city": "Roma",
+                "client_id": client.id,
+            })
+            task_id = task["id"]
+
+            offers = await asyncio.gather(*(
+                h.call("submit_offer", "POST", f"/tasks/{task_id}/offers", json={
+                    "price_cents": 3500 + i * 250, "message": "Posso venire oggi pomeriggio.",
+                })
+                for i, h in enumerate(helpers)
+            ))
+
+            chosen = helpers[0]
+            for i in range(self.messages):
+                await client.call("chat", "POST", f"/tasks/{task_id}/threads/{chosen.id}/messages",
+                                  json={"body": f"Domanda {i}: a che ora?"})
+                await chosen.call("chat", "POST", f"/tasks/{task_id}/threads/{chosen.id}/messages",
+                                  json={"body": f"Risposta {i}: alle 15."})
+
+            await client.call("select_offer", "POST", f"/tasks/{task_id}/offers/{offers[0]['id']}/select")
+            await chosen.call("start", "POST", f"/tasks/{task_id}/start")
+            await chosen.call("upload_proof", "POST", f"/tasks/{task_id}/proofs/upload",
+                              files={"file": ("proof.png", PROOF_PNG, "image/png")})
+            await chosen.call("request_completion", "POST", f"/tasks/{task_id}/complete-request")
+            await client.call("confirm", "POST", f"/tasks/{task_id}/confirm")
+            await asyncio.gather(
+                client.call("review", "POST", f"/tasks/{task_id}/reviews", json={"stars": 5, "comment": "Ottimo lavoro"}),
+                chosen.call("review", "POST", f"/tasks/{task_id}/reviews", json={"stars": 5, "comment": "Cliente puntuale"}),
+            )
+            # Let the last events (reveal, coalesced status changes) arrive
+            await asyncio.sleep(2.0)
+            self.metrics.completed += 1
+        except StepFailed as exc:
+            self.metrics.failed[exc.step] += 1
+            print(f"  scenario {n} failed: {exc}")
+        finally:
+            await asyncio.gather(*(u.close() for u in users))
+
+    async def run(self, scenarios: int, concurrency: int) -> float:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(n: int):
+            async with semaphore:
+                await self.scenario(n)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited(n) for n in range(scenarios)))
+        return time.perf_counter() - start
+
+
+def _pct(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def report(metrics: Metrics, elapsed: float):
+    print(f"\n{'step':<20}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  errors")
+    for step, samples in metrics.latencies.items():
+        errors = ", ".join(f"{code}x{n}" for code, n in metrics.errors[step].items()) or "-"
+        print(f"{step:<20}{len(samples):>7}{statistics.median(samples):>9.1f}"
+              f"{_pct(samples, 95):>9.1f}{_pct(samples, 99):>9.1f}  {errors}")
+
+    print(f"\n{'event':<24}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}   (delivery lag)")
+    for event_type, lags in sorted(metrics.event_lag.items()):
+        print(f"{event_type:<24}{len(lags):>7}{statistics.median(lags):>9.1f}"
+              f"{_pct(lags, 95):>9.1f}{_pct(lags, 99):>9.1f}")
+
+    print(f"\nWall time:   {elapsed:.1f} s")
+    print(f"Lifecycles:  {metrics.completed} completed ({metrics.completed / elapsed:.2f}/s)")
+    print(f"Requests:    {metrics.requests} ({metrics.requests / elapsed:.1f}/s)")
+    print(f"Events:      {metrics.events_received} received")
+    if metrics.failed:
+        print("Failures:    " + ", ".join(f"{k}x{v}" for k, v in metrics.failed.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenarios", type=int, default=20, help="Lifecycles to run in total")
+    parser.add_argument("--concurrency", type=int, default=10, help="Lifecycles in flight at once")
+    parser.add_argument("--helpers", type=int, default=2, help="Helpers making offers per task")
+    parser.add_argument("--messages", type=int, default=3, help="Chat round trips before selection")
+    args = parser.parse_args()
+    if args.helpers < 1:
+        parser.error("--helpers must be at least 1")
+
+    runner = LoadRunner(args)
+    print(f"Running {args.scenarios} lifecycles against {runner.base_url} "
+          f"({args.concurrency} concurrent, {args.helpers} helpers each)")
+    elapsed = asyncio.run(runner.run(args.scenarios, args.concurrency))
+    runner.executor.shutdown()
+    report(runner.metrics, elapsed)
+    sys.exit(1 if runner.metrics.failed else 0)
+
+
+if __name__ == "__main__":
+    main()
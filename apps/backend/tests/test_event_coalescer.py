@@ -0,0 +1,113 @@
+import asyncio
+
+from app.core.event_coalescer import EventCoalescer
+from app.core.event_stream import parse_event_id
+
+
+def _event(seq: int, type: str, **fields) -> dict:
+    return {"type": type, "event_id": f"1000-{seq}", **fields}
+
+
+def _first_ids(frames):
+    # Stream position of the oldest event in each frame
+    return [min(parse_event_id(c["event_id"]) for c in f.get("changes", [f])) for f in frames]
+
+
+def _delivered(frames):
+    seqs = []
+    for frame in frames:
+        for change in frame.get("changes", [frame]):
+            seqs.append(parse_event_id(change["event_id"])[1])
+    return sorted(seqs)
+
+
+def _run(events, settle: float = 1.0):
+    """Push `events` as (delay_before, event) and return the frames sent."""
+    frames = []
+
+    async def send(frame):
+        frames.append(frame)
+
+    async def main():
+        coalescer = EventCoalescer(send)
+        for delay, event in events:
+            if delay:
+                await asyncio.sleep(delay)
+            await coalescer.push(event)
+        await asyncio.sleep(settle)
+        return coalescer
+
+    coalescer = asyncio.run(main())
+    return frames, coalescer
+
+
+def test_immediate_event_flushes_older_groups_first():
+    frames, coalescer = _run([
+        (0, _event(1, "new_offer", task_id=1, offer_id=10)),
+        (0, _event(2, "new_offer", task_id=1, offer_id=11)),
+        (0, _event(3, "new_message", thread_id=7, message_id=100)),
+    ])
+    assert [f["type"] for f in frames] == ["new_offer", "new_message"]
+    assert frames[0]["coalesced"] is True
+    assert _first_ids(frames) == sorted(_first_ids(frames))
+    assert coalescer.delivered_id == "1000-3"
+
+
+def test_due_group_does_not_overtake_older_group():
+    # task 1 opens first with a long window; task 2's short window falls due first
+    frames, coalescer = _run([
+        (0, _event(1, "offer_status_changed", task_id=1, offer_id=10)),
+        (0, _event(2, "task_status_changed", task_id=2)),
+        (0.1, _event(3, "new_offer", task_id=1, offer_id=11)),
+    ])
+    assert len(frames) == 2
+    assert _first_ids(frames) == sorted(_first_ids(frames))
+    assert _delivered(frames) == [1, 2, 3]
+    assert coalescer.delivered_id == "1000-3"
+
+
+def test_mixed_types_keep_stream_order():
+    frames, _ = _run([
+        (0, _event(1, "new_offer", task_id=1, offer_id=10)),
+        (0, _event(2, "read_receipt", thread_id=7, message_id=99)),
+        (0.05, _event(3, "task_status_changed", task_id=2)),
+        (0, _event(4, "new_message", thread_id=7, message_id=100)),
+        (0, _event(5, "new_offer", task_id=1, offer_id=12)),
+        (0.05, _event(6, "new_message", thread_id=8, message_id=101)),
+    ], settle=1.6)
+    assert _first_ids(frames) == sorted(_first_ids(frames))
+    assert _delivered(frames) == [1, 2, 3, 4, 5, 6]
+
+
+def test_frame_cursor_never_passes_an_unsent_event():
+    # task 1's merged frame holds events on both sides of task 2's event
+    frames, coalescer = _run([
+        (0, _event(1, "offer_status_changed", task_id=1, offer_id=10)),
+        (0, _event(2, "task_status_changed", task_id=2)),
+        (0.1, _event(3, "new_offer", task_id=1, offer_id=11)),
+    ])
+    sent = set()
+    cursors = []
+    for frame in frames:
+        sent.update(parse_event_id(c["event_id"])[1] for c in frame.get("changes", [frame]))
+        cursor = parse_event_id(frame["event_id"])
+        cursors.append(cursor)
+        assert all(seq in sent for seq in range(1, cursor[1] + 1))
+    assert cursors == sorted(cursors)
+    assert coalescer.delivered_id == "1000-3"
+
+
+def test_close_flushes_pending_groups():
+    frames = []
+
+    async def send(frame):
+        frames.append(frame)
+
+    async def main():
+        coalescer = EventCoalescer(send)
+        await coalescer.push(_event(1, "new_offer", task_id=1, offer_id=10))
+        await coalescer.push(_event(2, "read_receipt", thread_id=7, message_id=99))
+        await coalescer.close()
+
+    asyncio.run(main())
+    assert _delivered(frames) == [1, 2]
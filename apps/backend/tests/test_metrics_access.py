@@ -0,0 +1,21 @@
+from app.core.metrics import parse_networks, scrape_allowed
+
+
+def test_default_allows_loopback_only():
+    networks = parse_networks("127.0.0.1/32,::1/128")
+    assert scrape_allowed("127.0.0.1", networks)
+    assert scrape_allowed("::1", networks)
+    assert not scrape_allowed("10.0.0.5", networks)
+
+
+def test_cidr_and_bare_address():
+    networks = parse_networks(" 10.0.0.0/8 , 192.168.1.7")
+    assert scrape_allowed("10.20.30.40", networks)
+    assert scrape_allowed("192.168.1.7", networks)
+    assert not scrape_allowed("192.168.1.8", networks)
+
+
+def test_missing_or_unparsable_client_is_refused():
+    networks = parse_networks("0.0.0.0/0")
+    assert not scrape_allowed(None, networks)
+    assert not scrape_allowed("testclient", networks)
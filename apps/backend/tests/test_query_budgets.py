@@ -0,0 +1,81 @@
+"""
+Query counts of the hot read endpoints, with QUERY_BUDGET_MODE=raise.
+
+Runs the bench scenarios once against the seeded bench database: a route
+that exceeds its query_budget() or repeats a statement shape (N+1) fails
+with QueryBudgetExceeded, and X-Query-Count is pinned below so a new query
+on a hot path shows up here. Needs BENCH_DATABASE_URL (see
+scripts/bench_endpoints.py); skipped otherwise.
+"""
+import asyncio
+import importlib.util
+import os
+
+import pytest
+
+if not os.environ.get("BENCH_DATABASE_URL"):
+    pytest.skip("BENCH_DATABASE_URL not set", allow_module_level=True)
+pytest.importorskip("fakeredis")
+
+# Most statements each scenario may run, dependencies (loading the user) included
+MAX_QUERIES = {
+    "nearby": 9,
+    "nearby_card": 3,
+    "created": 7,
+    "created_card": 3,
+    "assigned": 4,
+    "assigned_card": 3,
+    "task_detail": 8,
+    "my_threads": 6,
+    "helper_threads": 6,
+    "messages": 5,
+    "task_messages": 2,
+    "helper_stats": 5,
+}
+
+
+def _load_bench():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "bench_endpoints.py")
+    spec = importlib.util.spec_from_file_location("bench_endpoints", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="module")
+def responses():
+    bench = _load_bench()
+    from app.core.config import settings
+    assert settings.QUERY_BUDGET_MODE == "raise"
+
+    async def run():
+        await bench.reset_schema()
+        ids = await bench.seed(0.05)
+        results = {}
+        try:
+            for name, path, query, token in bench.scenarios(ids):
+                try:
+                    results[name] = await bench.asgi_get(path, query, token)
+                except Exception as exc:
+                    # QueryBudgetExceeded propagates out of the ASGI app
+                    results[name] = exc
+        finally:
+            await bench.engine.dispose()
+        return results
+
+    return asyncio.run(run())
+
+
+def test_every_scenario_is_pinned(responses):
+    assert set(responses) == set(MAX_QUERIES)
+
+
+@pytest.mark.parametrize("name", sorted(MAX_QUERIES))
+def test_query_count_within_budget(responses, name):
+    response = responses[name]
+    if isinstance(response, Exception):
+        raise response
+    status, body, headers = response
+    assert status == 200, body[:300]
+    count = int(headers["x-query-count"])
+    assert 0 < count <= MAX_QUERIES[name]
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from app.services import read_receipts
+from app.services.read_receipts import ReadReceiptBuffer
+
+
+def test_failed_flush_keeps_the_batch(monkeypatch):
+    buffer = ReadReceiptBuffer()
+    buffer.mark(reader_id=7, thread_id=1, up_to_message_id=10)
+    buffer.mark(reader_id=8, thread_id=2, up_to_message_id=20)
+
+    async def failing_mark_read(db, receipts):
+        # A newer receipt arrives while the write is in flight
+        buffer.mark(reader_id=7, thread_id=1, up_to_message_id=15)
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(read_receipts, "mark_read", failing_mark_read)
+    with pytest.raises(ConnectionError):
+        asyncio.run(buffer.flush())
+
+    assert buffer._pending == {(1, 7): 15, (2, 8): 20}
+    assert buffer.stats["failed_flushes"] == 1 and buffer.stats["flushes"] == 0
+
+
+def test_successful_flush_clears_the_batch(monkeypatch):
+    buffer = ReadReceiptBuffer()
+    buffer.mark(reader_id=7, thread_id=1, up_to_message_id=10)
+    written = []
+
+    async def fake_mark_read(db, receipts):
+        written.extend(receipts)
+        return {}
+
+    async def no_publish(changed):
+        pass
+
+    monkeypatch.setattr(read_receipts, "mark_read", fake_mark_read)
+    monkeypatch.setattr(read_receipts, "publish_read_receipts", no_publish)
+    asyncio.run(buffer.flush())
+
+    assert written == [(1, 7, 10)]
+    assert buffer._pending == {}
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from redis.exceptions import RedisError
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.core.redis_client import redis_client
+from app.core.task_lock import TaskLockManager, check_fence
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    # Scripts are registered on the client at construction time
+    monkeypatch.setattr(redis_client, "redis", fakeredis.FakeAsyncRedis(decode_responses=True))
+    return TaskLockManager()
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_tokens_increase_on_every_acquire(manager):
+    async def scenario():
+        tokens = []
+        for _ in range(3):
+            lock = await manager.acquire(1, "user:1")
+            tokens.append(lock.token)
+            await manager.release(lock)
+        return tokens
+
+    tokens = _run(scenario())
+    assert tokens == sorted(tokens) and len(set(tokens)) == 3
+
+
+def test_held_lock_cannot_be_acquired(manager):
+    async def scenario():
+        first = await manager.acquire(1, "user:1")
+        return first, await manager.acquire(1, "user:2")
+
+    first, second = _run(scenario())
+    assert first is not None and second is None
+
+
+def test_non_owner_cannot_renew_or_release(manager):
+    async def scenario():
+        lock = await manager.acquire(1, "user:1")
+        impostor = type(lock)(task_id=1, holder="user:2:abc", token=lock.token, ttl_ms=lock.ttl_ms)
+        renewed = await manager.renew(impostor)
+        released = await manager.release(impostor)
+        still_held = await redis_client.redis.get(manager._lock_key(1))
+        return renewed, released, impostor.lost, still_held, lock.value
+
+    renewed, released, lost, still_held, value = _run(scenario())
+    assert not renewed and not released and lost
+    assert still_held == value
+
+
+def test_hold_releases_when_block_raises(manager):
+    async def scenario():
+        with pytest.raises(ValueError):
+            async with manager.hold(1, "user:1"):
+                raise ValueError("boom")
+        return await redis_client.redis.exists(manager._lock_key(1))
+
+    assert _run(scenario()) == 0
+
+
+def test_hold_survives_a_failing_renewer(manager):
+    async def failing_renew(**kwargs):
+        raise RedisError("connection lost")
+
+    async def scenario():
+        manager._renew = failing_renew
+        async with manager.hold(1, "user:1", ttl_seconds=0.03) as lock:
+            # Long enough for the renewer to run and die
+            await asyncio.sleep(0.05)
+        return lock, await redis_client.redis.exists(manager._lock_key(1))
+
+    lock, exists = _run(scenario())
+    assert lock.token > 0 and exists == 0
+
+
+def test_failed_release_does_not_hide_the_block_error(manager):
+    async def failing_release(**kwargs):
+        raise RedisError("connection lost")
+
+    async def scenario():
+        manager._release = failing_release
+        async with manager.hold(1, "user:1"):
+            raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        _run(scenario())
+
+
+def test_check_fence_rejects_stale_token():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    import app.models.address  # noqa: F401  (Task mappers reference Address)
+
+    async def scenario():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            # Only the columns the fence UPDATE touches
+            await conn.execute(text("CREATE TABLE tasks (id INTEGER PRIMARY KEY, lock_fence INTEGER)"))
+            await conn.execute(text("INSERT INTO tasks (id) VALUES (1)"))
+        async with AsyncSession(engine) as db:
+            await check_fence(db, 1, 5)
+            await db.commit()
+            rejected = []
+            for token in (3, 5):
+                try:
+                    await check_fence(db, 1, token)
+                except HTTPException as exc:
+                    rejected.append(exc.status_code)
+            await check_fence(db, 1, 6)
+            await db.commit()
+            fence = (await db.execute(text("SELECT lock_fence FROM tasks WHERE id = 1"))).scalar()
+        await engine.dispose()
+        return rejected, fence
+
+    rejected, fence = _run(scenario())
+    assert rejected == [409, 409]
+    assert fence == 6